@@ -0,0 +1,64 @@
+"""Calls per second through `debug` with each sink, 4 threads, big arguments.
+
+Run from the repo root with `python -m benchmarks.bench_debug`.
+"""
+
+import contextlib
+import os
+import tempfile
+import threading
+import time
+
+from src.useful_decorators.decorators import JsonlSink, QueueSink, debug
+
+CALLS = 5_000
+THREADS = 4
+BIG = list(range(10_000))
+
+
+def work(data, scale=1):
+    return len(data) * scale
+
+
+def throughput(func):
+    def loop():
+        for _ in range(CALLS):
+            func(BIG, scale=2)
+
+    workers = [threading.Thread(target=loop) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return CALLS * THREADS / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        jsonl_sink = JsonlSink(os.path.join(tmp, "calls.jsonl"))
+        queue_sink = QueueSink(JsonlSink(os.path.join(tmp, "queued.jsonl")))
+        full_sink = QueueSink(JsonlSink(os.path.join(tmp, "full.jsonl")))
+        modes = (
+            ("plain", work),
+            ("stdout", debug(work)),
+            ("stdout max_repr=60", debug(max_repr=60)(work)),
+            ("stdout 1% sampled", debug(sample_rate=0.01)(work)),
+            ("jsonl", debug(sink=jsonl_sink)(work)),
+            ("jsonl max_repr=60", debug(sink=jsonl_sink, max_repr=60)(work)),
+            ("queue max_repr=60", debug(sink=queue_sink, max_repr=60)(work)),
+            ("queue", debug(sink=full_sink)(work)),
+        )
+        for name, func in modes:
+            with contextlib.redirect_stdout(devnull):
+                rate = throughput(func)
+            print(f"{name:<20} {rate:>12,.0f} calls/s")
+        jsonl_sink.close()
+        queue_sink.close()
+        full_sink.close()
+        print(f"queue max_repr=60 sink dropped {queue_sink.dropped} records")
+        print(f"queue sink dropped {full_sink.dropped} records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Fused accept path against running each validator closure in turn.
+
+Run from the repo root with `python -m benchmarks.bench_fusion`.
+"""
+
+import timeit
+
+import src.useful_decorators.pipeline.validators as val
+from src.useful_decorators.pipeline.fusion import fuse_validators
+from src.useful_decorators.pipeline.validate_dec import _run_validations
+
+NUMBER = 200_000
+
+SUITES = {
+    "range": ([val.ge(0), val.le(100)], 50),
+    "len range": ([val.min_len(1), val.max_len(10)], "abc"),
+    "types": ([val.is_type(int), val.is_type(object)], 1),
+    "typed range": ([val.is_type(int), val.gt(0), val.lt(100)], 50),
+    "string": (
+        [val.is_type(str), val.min_len(1), val.max_len(8), val.re_match("[a-z]+")],
+        "abc",
+    ),
+}
+
+
+def main():
+    for name, (validators, value) in SUITES.items():
+        accept = fuse_validators(validators, "a")
+        unfused = min(
+            timeit.repeat(
+                lambda: _run_validations(validators, "a", value),
+                number=NUMBER,
+                repeat=5,
+            )
+        )
+        fused = min(timeit.repeat(lambda: accept(value), number=NUMBER, repeat=5))
+        print(
+            f"{name:<12} unfused {unfused / NUMBER * 1e9:7.1f} ns"
+            f"  fused {fused / NUMBER * 1e9:7.1f} ns  {unfused / fused:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Per-call overhead of `LatencyRecorder.timed`, single and multi threaded.
+
+Run from the repo root with `python -m benchmarks.bench_latency`.
+"""
+
+import threading
+import time
+
+from src.useful_decorators.decorators import LatencyRecorder
+
+CALLS = 200_000
+
+
+def noop(n):
+    return n
+
+
+def per_call_ns(func, threads=1):
+    def loop():
+        for i in range(CALLS):
+            func(i)
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    start = time.perf_counter_ns()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter_ns() - start) / (CALLS * threads)
+
+
+def main():
+    timed = LatencyRecorder.timed(name="bench.noop")(noop)
+    for threads in (1, 4):
+        plain = per_call_ns(noop, threads)
+        recorded = per_call_ns(timed, threads)
+        print(
+            f"{threads} thread(s)  plain {plain:6.0f} ns/call  "
+            f"timed {recorded:6.0f} ns/call  overhead {recorded - plain:6.0f} ns"
+        )
+    snap = timed.histogram.snapshot()
+    print(f"recorded {snap.count} calls, p50 {snap.p50_ns} ns, p99 {snap.p99_ns} ns")
+
+
+if __name__ == "__main__":
+    main()
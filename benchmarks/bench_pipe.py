@@ -0,0 +1,52 @@
+"""Throughput of `Pipe.run_many` as workers are added.
+
+Run from the repo root with `python -m benchmarks.bench_pipe`.
+"""
+
+import os
+import time
+
+from src.useful_decorators.pipeline.pipe import Pipe
+
+ITEMS = 64
+
+
+@Pipe.stage()
+def cpu_bound(n):
+    return sum(i * i for i in range(200_000 + n))
+
+
+@Pipe.stage()
+def io_bound(n):
+    time.sleep(0.005)
+    return n
+
+
+def throughput(stages, executor, workers):
+    start = time.perf_counter()
+    Pipe.run_many(
+        stages, range(ITEMS), executor=executor, max_workers=workers, chunksize=4
+    )
+    return ITEMS / (time.perf_counter() - start)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    workers = sorted({1, 2, 4, cores})
+    for name, stages, executor in (
+        ("cpu/process", (cpu_bound,), "process"),
+        ("cpu/thread", (cpu_bound,), "thread"),
+        ("io/thread", (io_bound,), "thread"),
+    ):
+        rates = [throughput(stages, executor, n) for n in workers]
+        print(
+            f"{name:<12}"
+            + "".join(
+                f"  {n:>2} workers {rate:8.1f}/s {rate / rates[0]:4.1f}x"
+                for n, rate in zip(workers, rates)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Per-call overhead of the `profile_func` modes on a small function.
+
+Run from the repo root with `python -m benchmarks.bench_profile`.
+"""
+
+import contextlib
+import io
+import time
+
+from src.useful_decorators.decorators import profile_func
+
+CALLS = 2_000
+
+
+def work(n):
+    return sum(i * i for i in range(n))
+
+
+def per_call_us(func):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func(200)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main():
+    modes = (
+        ("plain", work),
+        ("cprofile per call", profile_func()(work)),
+        ("cprofile aggregate", profile_func(aggregate=True)(work)),
+        ("aggregate every 100", profile_func(aggregate=True, every_n=100)(work)),
+        ("aggregate 1% calls", profile_func(aggregate=True, sample_rate=0.01)(work)),
+        ("stack sampling", profile_func(backend="sampling")(work)),
+    )
+    baseline = None
+    for name, func in modes:
+        # the per call mode prints a report every call
+        with contextlib.redirect_stdout(io.StringIO()):
+            us = per_call_us(func)
+        baseline = baseline or us
+        print(f"{name:<22} {us:8.2f} us/call  {us / baseline:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Per call overhead of `validate_args` relative to the undecorated function.
+
+Run from the repo root with `python -m benchmarks.bench_validate_dec`.
+"""
+
+import timeit
+
+import src.useful_decorators.pipeline.converters as con
+import src.useful_decorators.pipeline.validators as val
+from src.useful_decorators.pipeline.validate_dec import validate_args
+
+NUMBER = 200_000
+
+
+def handler(a, b, c=1.0, d="x"):
+    return a
+
+
+CASES = {
+    "undecorated": handler,
+    "no rules": validate_args()(handler),
+    "one arg": validate_args(validations={"a": [val.is_type(int)]})(handler),
+    "all args": validate_args(
+        validations={
+            "a": [val.is_type(int), val.ge(0), val.le(100)],
+            "b": [val.is_type(int)],
+            "c": [val.gt(0)],
+            "d": [val.max_len(3)],
+        },
+        conversions={"c": [con.to_type(float)]},
+    )(handler),
+    "return only": validate_args(validations={"return": [val.is_type(int)]})(handler),
+}
+
+
+def main():
+    baseline = None
+    for name, func in CASES.items():
+        secs = min(timeit.repeat(lambda: func(1, 2, d="y"), number=NUMBER, repeat=5))
+        per_call = secs / NUMBER * 1e9
+        baseline = baseline or per_call
+        print(f"{name:<12} {per_call:8.1f} ns/call  {per_call / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import threading
+import uuid
+from typing import Callable, Iterator, List
+
+_FORMATS = {"jsonl": ".jsonl", "pickle": ".pkl"}
+
+
+class CaseStore:
+    # a sink for `print_test_case` that keeps one record per distinct set of
+    # arguments of each function, in shards rotated once they reach
+    # max_shard_bytes, wrap it in a QueueSink to write from a background thread
+    def __init__(
+        self,
+        directory: str,
+        fmt: str = "jsonl",
+        max_shard_bytes: int = 8 * 1024 * 1024,
+        max_records: int = None,
+    ):
+        if fmt not in _FORMATS:
+            raise ValueError(f"`fmt` must be jsonl or pickle. Got: {fmt}.")
+        if max_records is not None and max_records < 1:
+            raise ValueError(f"`max_records` must be at least 1. Got: {max_records}.")
+        self.directory = directory
+        self.fmt = fmt
+        self.max_shard_bytes = max_shard_bytes
+        self.max_records = max_records
+        # records that can't be written and read back in the chosen format
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._shard_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # cases captured by earlier processes still count as seen
+        self._seen = {record["hash"] for record in load_cases(directory)}
+        # every store writes shards of its own, so processes capturing into one
+        # directory never append to the same file
+        self._prefix = f"shard-{uuid.uuid4().hex[:12]}"
+        self._shard = 0
+
+    def __len__(self):
+        return len(self._seen)
+
+    def enabled(self) -> bool:
+        return not self._full()
+
+    def emit(self, record: dict, render: Callable[[dict], str]):
+        if self._full():
+            return
+        key = case_key(record["func"], record["params"])
+        if key in self._seen:
+            return
+        record = {"hash": key, **record}
+        try:
+            if self.fmt == "jsonl":
+                payload = (json.dumps(record) + "\n").encode()
+                # json turns tuples into lists and keys into strings, a case
+                # that wouldn't replay as captured isn't kept
+                if json.loads(payload) != record:
+                    raise ValueError("record doesn't round-trip through json")
+            else:
+                payload = pickle.dumps(record)
+        except (TypeError, ValueError, pickle.PicklingError, AttributeError):
+            self.skipped += 1
+            return
+
+        with self._lock:
+            if key in self._seen or self._full():
+                return
+            self._seen.add(key)
+            if self._file is None or self._shard_bytes >= self.max_shard_bytes:
+                self._rotate()
+            self._file.write(payload)
+            self._shard_bytes += len(payload)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _full(self) -> bool:
+        return self.max_records is not None and len(self._seen) >= self.max_records
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(
+            self.directory, f"{self._prefix}-{self._shard:05d}{_FORMATS[self.fmt]}"
+        )
+        self._shard += 1
+        self._file = open(path, "ab")
+        self._shard_bytes = 0
+
+
+def case_key(func_name: str, params: dict) -> str:
+    # repr stands in for values json can't encode, and sorting makes the key
+    # independent of keyword order
+    text = json.dumps([func_name, params], sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def load_cases(directory: str, func_name: str = None) -> Iterator[dict]:
+    for path in _shards(directory):
+        for record in _read_shard(path):
+            if func_name is None or record["func"] == func_name:
+                yield record
+
+
+def pytest_params(directory: str, func_name: str = None) -> List:
+    # for `pytest.mark.parametrize("params, expected", pytest_params(...))`, the
+    # same shape `print_test_case` prints
+    import pytest
+
+    return [
+        pytest.param(
+            record["params"],
+            record["return"],
+            id=f"{record['func']}-{record['hash'][:10]}",
+        )
+        for record in load_cases(directory, func_name)
+    ]
+
+
+def _shards(directory: str) -> List[str]:
+    return sorted(
+        path
+        for ext in _FORMATS.values()
+        for path in glob.glob(os.path.join(directory, f"shard-*{ext}"))
+    )
+
+
+def _read_shard(path: str) -> Iterator[dict]:
+    if path.endswith(_FORMATS["jsonl"]):
+        with open(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a line cut short when the writing process died
+                    continue
+        return
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                return
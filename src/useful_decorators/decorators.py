@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 import cProfile
 import inspect
+import json
+import logging
+import math
+import os
+import pickle
 import pstats
+import queue
+import random
+import reprlib
+import sys
+import tempfile
 import threading
-from functools import wraps
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+from functools import partial, wraps
 from io import StringIO
-from typing import Callable, Tuple, Union
+from itertools import count
+from typing import Callable, Dict, List, NamedTuple, Tuple, Union
 
 from .metaclasses import SingletonMeta
 
@@ -23,61 +39,674 @@ class ExceptionLogger(metaclass=SingletonMeta):
         msg: str = "",
     ) -> Callable:
         def decorator(func: Callable):
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                try:
-                    res = func(*args, **kwargs)
-                    return res, None
-                except catch_exceptions as e:
-                    raise_exception = (
-                        custom_exception
-                        if custom_exception is not Exception
-                        else type(e)
-                    )
-                    exc = raise_exception(
+            def log_exception(e, args, kwargs):
+                raise_exception = (
+                    custom_exception if custom_exception is not Exception else type(e)
+                )
+                exc = raise_exception(
+                    {
+                        "func": func.__name__,
+                        "args": args,
+                        "kwargs": kwargs,
+                        "caught_error": e,
+                        "msg": msg or str(e),
+                    }
+                )
+                with cls._log_lock:
+                    cls.log.append(exc)
+                return None, exc
+
+            if inspect.iscoroutinefunction(func):
+
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    try:
+                        res = await func(*args, **kwargs)
+                        return res, None
+                    except catch_exceptions as e:
+                        return log_exception(e, args, kwargs)
+
+            else:
+
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    try:
+                        res = func(*args, **kwargs)
+                        return res, None
+                    except catch_exceptions as e:
+                        return log_exception(e, args, kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+class RetryPolicy:
+    __slots__ = (
+        "attempts",
+        "base_delay",
+        "max_delay",
+        "multiplier",
+        "jitter",
+        "retry_on",
+        "give_up_on",
+        "deadline",
+    )
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: float = 1.0,
+        retry_on: Union[Exception, Tuple[Exception]] = Exception,
+        give_up_on: Union[Exception, Tuple[Exception]] = (),
+        deadline: float = None,
+    ):
+        # the nth wait is base_delay * multiplier ** (n - 1) capped at max_delay,
+        # minus a random fraction of up to `jitter` of it, deadline is in seconds
+        # from the first attempt and no wait is started that would overrun it
+        if attempts < 1:
+            raise ValueError(f"`attempts` must be at least 1. Got: {attempts}.")
+        if not 0.0 <= jitter <= 1.0:
+            raise ValueError(f"`jitter` must be in [0, 1]. Got: {jitter}.")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_on = retry_on
+        self.give_up_on = give_up_on
+        self.deadline = deadline
+
+    def call(self, func: Callable, args, kwargs, on_retry: Callable = None):
+        start = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, time.monotonic() - start)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(e, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, func: Callable, args, kwargs, on_retry: Callable = None):
+        start = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, time.monotonic() - start)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def next_delay(self, error: Exception, attempt: int, elapsed: float):
+        # the wait before the next attempt, None to give up and raise `error`
+        if attempt >= self.attempts:
+            return None
+        if not isinstance(error, self.retry_on) or isinstance(error, self.give_up_on):
+            return None
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        delay -= random.uniform(0, delay * self.jitter)
+        if self.deadline is not None and elapsed + delay > self.deadline:
+            return None
+        return delay
+
+
+class RetryLogger(metaclass=SingletonMeta):
+    _log_lock = threading.Lock()
+    log = []
+
+    @classmethod
+    def retry(
+        cls,
+        attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: float = 1.0,
+        retry_on: Union[Exception, Tuple[Exception]] = Exception,
+        give_up_on: Union[Exception, Tuple[Exception]] = (),
+        deadline: float = None,
+    ) -> Callable:
+        # calls that needed more than one attempt, or that gave up, are logged
+        policy = RetryPolicy(
+            attempts,
+            base_delay,
+            max_delay,
+            multiplier,
+            jitter,
+            retry_on,
+            give_up_on,
+            deadline,
+        )
+
+        def decorator(func: Callable):
+            def log_attempts(args, kwargs, errors, waits, error=None):
+                if not errors and error is None:
+                    return
+                with cls._log_lock:
+                    cls.log.append(
                         {
                             "func": func.__name__,
                             "args": args,
                             "kwargs": kwargs,
-                            "caught_error": e,
-                            "msg": msg or str(e),
+                            "attempts": len(errors) + 1,
+                            "wait_s": sum(waits),
+                            "errors": errors if error is None else [*errors, error],
                         }
                     )
-                    with cls._log_lock:
-                        cls.log.append(exc)
-                    return None, exc
+
+            if inspect.iscoroutinefunction(func):
+
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    errors, waits = [], []
+
+                    def on_retry(e, delay):
+                        errors.append(e)
+                        waits.append(delay)
+
+                    try:
+                        res = await policy.acall(func, args, kwargs, on_retry)
+                    except Exception as e:
+                        log_attempts(args, kwargs, errors, waits, e)
+                        raise
+                    log_attempts(args, kwargs, errors, waits)
+                    return res
+
+            else:
+
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    errors, waits = [], []
+
+                    def on_retry(e, delay):
+                        errors.append(e)
+                        waits.append(delay)
+
+                    try:
+                        res = policy.call(func, args, kwargs, on_retry)
+                    except Exception as e:
+                        log_attempts(args, kwargs, errors, waits, e)
+                        raise
+                    log_attempts(args, kwargs, errors, waits)
+                    return res
 
             return wrapper
 
         return decorator
 
 
-def debug(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        res = func(*args, **kwargs)
-        print({"func": func.__name__, "args": args, "kwargs": kwargs, "return": res})
-        return res
+class StdoutSink:
+    # sinks get the record and a function rendering it as a line, so sinks that
+    # never print don't pay for the formatting
+    def emit(self, record: dict, render: Callable[[dict], str]):
+        print(render(record))
+
+    def close(self):
+        pass
+
+
+class LoggingSink:
+    # the line is only rendered if the logger would output it, the record is
+    # passed on as `extra` for structured handlers
+    def __init__(self, logger: logging.Logger = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("useful_decorators")
+        self.level = level
+
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(self.level)
+
+    def emit(self, record: dict, render: Callable[[dict], str]):
+        if self.enabled():
+            self.logger.log(
+                self.level, "%s", _Rendered(render, record), extra={"record": record}
+            )
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def emit(self, record: dict, render: Callable[[dict], str]):
+        line = json.dumps({"time": time.time(), **record}, default=repr)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class QueueSink:
+    # hands records to a background thread that writes them to `sink`, when the
+    # queue is full or the sink is closed records are dropped and counted
+    # rather than blocking callers, sinks with an `enabled()` method that
+    # returns False are skipped without queueing anything
+    def __init__(self, sink=None, max_queue: int = 10_000):
+        self.sink = StdoutSink() if sink is None else sink
+        self.dropped = 0
+        self._enabled = getattr(self.sink, "enabled", None)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def emit(self, record: dict, render: Callable[[dict], str]):
+        if self._enabled is not None and not self._enabled():
+            return
+        if self._closed or self._queue.full():
+            self._drop()
+            return
+        # callers may change their arguments once the call returns, so the
+        # record is pickled here and rendered by the writer from the copy
+        item = (_snapshot(record), render)
+        with self._lock:
+            if not self._closed:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # everything queued so far is written before the writer stops
+            self._queue.put(None)
+        self._writer.join()
+        self.sink.close()
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def _write(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            snapshot, render = item
+            self.sink.emit(pickle.loads(snapshot), render)
+
+
+def _snapshot(record: dict) -> bytes:
+    try:
+        return pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return pickle.dumps(_picklable(record), pickle.HIGHEST_PROTOCOL)
+
+
+def _picklable(value):
+    # values that can't be pickled, like locks, are kept as their repr
+    if isinstance(value, dict):
+        return {k: _picklable(v) for k, v in value.items()}
+    if type(value) in (list, tuple):
+        return type(value)(_picklable(v) for v in value)
+    try:
+        pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return repr(value)
+    return value
+
+
+class _Rendered:
+    __slots__ = ("render", "record")
+
+    def __init__(self, render: Callable[[dict], str], record: dict):
+        self.render = render
+        self.record = record
+
+    def __str__(self):
+        return self.render(self.record)
+
+
+_STDOUT_SINK = StdoutSink()
+
+
+def debug(
+    func: Callable = None,
+    *,
+    sink=None,
+    max_repr: int = None,
+    every_n: int = None,
+    sample_rate: float = None,
+):
+    # usable bare or with options, max_repr truncates the reprs of arguments and
+    # return values to that many characters before they reach the sink
+    if func is None:
+        return partial(
+            debug,
+            sink=sink,
+            max_repr=max_repr,
+            every_n=every_n,
+            sample_rate=sample_rate,
+        )
+    sink = _STDOUT_SINK if sink is None else sink
+    sampled = _optional_sampler(every_n, sample_rate)
+    shorten = _shortener(max_repr)
+
+    def emit(args, kwargs, res):
+        if sampled is not None and not sampled():
+            return
+        if shorten is not None:
+            args = tuple(map(shorten, args))
+            kwargs = {k: shorten(v) for k, v in kwargs.items()}
+            res = shorten(res)
+        record = {"func": func.__name__, "args": args, "kwargs": kwargs, "return": res}
+        sink.emit(record, str)
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            res = await func(*args, **kwargs)
+            emit(args, kwargs, res)
+            return res
+
+    else:
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            res = func(*args, **kwargs)
+            emit(args, kwargs, res)
+            return res
 
     return wrapper
 
 
-def print_test_case(func):
+def print_test_case(
+    func: Callable = None,
+    *,
+    sink=None,
+    max_repr: int = None,
+    every_n: int = None,
+    sample_rate: float = None,
+):
+    if func is None:
+        return partial(
+            print_test_case,
+            sink=sink,
+            max_repr=max_repr,
+            every_n=every_n,
+            sample_rate=sample_rate,
+        )
+    sink = _STDOUT_SINK if sink is None else sink
+    sampled = _optional_sampler(every_n, sample_rate)
+    shorten = _shortener(max_repr)
+    param_names = list(inspect.signature(func).parameters.keys())
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        params = dict(zip(list(inspect.signature(func).parameters.keys()), args))
-        params.update(**kwargs)
         res = func(*args, **kwargs)
-        print(f"pytest.param({params}, {res}, id=''),")
+        if sampled is not None and not sampled():
+            return res
+        params = dict(zip(param_names, args))
+        params.update(**kwargs)
+        out = res
+        if shorten is not None:
+            params = {k: shorten(v) for k, v in params.items()}
+            out = shorten(res)
+        record = {"func": func.__name__, "params": params, "return": out}
+        sink.emit(record, _test_case_line)
         return res
 
     return wrapper
 
 
-def profile_func(sort_by="cumulative"):
+def _optional_sampler(every_n: int = None, sample_rate: float = None):
+    _check_sampling(every_n, sample_rate)
+    if every_n is None and sample_rate is None:
+        return None
+    return _call_sampler(every_n, sample_rate)
+
+
+def _test_case_line(record: dict) -> str:
+    return f"pytest.param({record['params']}, {record['return']}, id=''),"
+
+
+def _shortener(max_repr: int = None):
+    # reprlib stops walking big containers early, so huge arguments stay cheap
+    if max_repr is None:
+        return None
+    if max_repr < 4:
+        raise ValueError(f"`max_repr` must be at least 4. Got: {max_repr}.")
+    short = reprlib.Repr()
+    short.maxstring = short.maxother = short.maxlong = max_repr
+
+    def shorten(value) -> str:
+        text = short.repr(value)
+        return text if len(text) <= max_repr else text[: max_repr - 3] + "..."
+
+    return shorten
+
+
+def _check_sampling(every_n: int = None, sample_rate: float = None):
+    if every_n is not None and every_n < 1:
+        raise ValueError(f"`every_n` must be at least 1. Got: {every_n}.")
+    if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+        raise ValueError(f"`sample_rate` must be in [0, 1]. Got: {sample_rate}.")
+
+
+def _call_sampler(every_n: int = None, sample_rate: float = None) -> Callable:
+    # picks every nth call and then a random fraction of those
+    calls = count(1)
+
+    def sampled() -> bool:
+        if every_n is not None and next(calls) % every_n:
+            return False
+        return sample_rate is None or random.random() < sample_rate
+
+    return sampled
+
+
+class SharedProfile:
+    # one cProfile profiler accumulating every profiled call, cProfile can only
+    # profile one call at a time so overlapping calls run unprofiled
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    def run(self, func: Callable, args, kwargs):
+        if not self._lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            self.profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.profiler.disable()
+        finally:
+            self._lock.release()
+
+    def report(self, sort_by="cumulative", limit: int = None) -> str:
+        s = StringIO()
+        with self._lock:
+            ps = pstats.Stats(self.profiler, stream=s)
+        ps.strip_dirs().sort_stats(sort_by).print_stats(limit)
+        return s.getvalue()
+
+    def dump(self, path: str):
+        # a .prof file readable by pstats, snakeviz and the like
+        with self._lock:
+            self.profiler.dump_stats(path)
+        self._last_dump = time.monotonic()
+
+    def maybe_dump(self, path: str, interval: float = None):
+        if interval is None or time.monotonic() - self._last_dump >= interval:
+            self.dump(path)
+
+
+class StackSampler:
+    # a statistical profiler, a background thread records the stack of every
+    # thread inside a profiled call each `interval` seconds, so a call costs two
+    # dict updates instead of a hook on every python function call
+    def __init__(self, interval: float = 0.005):
+        if interval <= 0:
+            raise ValueError(f"`interval` must be positive. Got: {interval}.")
+        self.interval = interval
+        self.samples = Counter()
+        self._active = {}
+        self._root = None
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._last_dump = time.monotonic()
+
+    def run(self, func: Callable, args, kwargs):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._root = getattr(func, "__code__", None)
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, daemon=True)
+                self._sampler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+
+    def report(self, sort_by="self", limit: int = 20) -> str:
+        # frames by the share of samples they were running in (self) or on the
+        # stack for (cumulative)
+        with self._lock:
+            samples = self.samples.copy()
+        total = sum(samples.values())
+        counts = Counter()
+        for stack, num in samples.items():
+            if sort_by == "self":
+                counts[stack[-1]] += num
+            else:
+                for frame in set(stack):
+                    counts[frame] += num
+        lines = [f"{total} samples every {self.interval}s"]
+        lines += [
+            f"{num:>8} {num / total:7.1%}  {frame}"
+            for frame, num in counts.most_common(limit)
+        ]
+        return "\n".join(lines)
+
+    def dump(self, path: str):
+        # collapsed stacks, one `outer;inner count` line each, as read by
+        # flamegraph.pl and speedscope
+        with self._lock:
+            samples = self.samples.copy()
+        with open(path, "w") as f:
+            for stack, num in samples.items():
+                f.write(f"{';'.join(stack)} {num}\n")
+        self._last_dump = time.monotonic()
+
+    def maybe_dump(self, path: str, interval: float = None):
+        if interval is None or time.monotonic() - self._last_dump >= interval:
+            self.dump(path)
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                thread_ids = list(self._active)
+                if not thread_ids:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            stacks = [
+                _stack(frames[tid], self._root) for tid in thread_ids if tid in frames
+            ]
+            with self._lock:
+                self.samples.update(stacks)
+
+
+def _stack(frame, root=None) -> tuple:
+    # stops at the outermost call of `root`, so callers of the profiled function
+    # don't show up in every sample
+    stack = []
+    root_depth = None
+    while frame is not None:
+        code = frame.f_code
+        stack.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        )
+        if code is root:
+            root_depth = len(stack)
+        frame = frame.f_back
+    return tuple(reversed(stack[:root_depth]))
+
+
+def profile_func(
+    sort_by="cumulative",
+    aggregate: bool = False,
+    every_n: int = None,
+    sample_rate: float = None,
+    dump_path: str = None,
+    dump_interval: float = None,
+    backend: str = "cprofile",
+    interval: float = 0.005,
+):
+    # by default every call is profiled and printed
+    # aggregate collects the profiled calls into `wrapper.profile` instead, the
+    # sampling backend always aggregates
+    # every_n and sample_rate pick which calls are profiled
+    # dump_path is rewritten after a profiled call once dump_interval seconds
+    # have passed since the last dump, or after every one without an interval
+    if backend not in ("cprofile", "sampling"):
+        raise ValueError(f"`backend` must be cprofile or sampling. Got: {backend}.")
+    _check_sampling(every_n, sample_rate)
+    aggregate = aggregate or backend == "sampling"
+    if dump_path is not None and not aggregate:
+        raise ValueError("`dump_path` needs aggregate=True or the sampling backend")
+
     def decorator(func):
+        sampled = _call_sampler(every_n, sample_rate)
+
+        if aggregate:
+            if backend == "sampling":
+                profile = StackSampler(interval)
+            else:
+                profile = SharedProfile()
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not sampled():
+                    return func(*args, **kwargs)
+                result = profile.run(func, args, kwargs)
+                if dump_path is not None:
+                    profile.maybe_dump(dump_path, dump_interval)
+                return result
+
+            wrapper.profile = profile
+            return wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if not sampled():
+                return func(*args, **kwargs)
             profiler = cProfile.Profile()
             profiler.enable()
             result = func(*args, **kwargs)
@@ -93,3 +722,419 @@ def profile_func(sort_by="cumulative"):
         return wrapper
 
     return decorator
+
+
+# latencies fall into log-linear buckets, the first 32 hold one nanosecond each
+# and every power of two above is split into 16, so a bucket is at most 1/16 of
+# its values wide
+_SUB_BITS = 4
+_SUB_BUCKETS = 1 << _SUB_BITS
+_NUM_BUCKETS = (64 - _SUB_BITS + 1) * _SUB_BUCKETS
+
+
+class LatencySnapshot(NamedTuple):
+    count: int
+    mean_ns: float
+    p50_ns: int
+    p95_ns: int
+    p99_ns: int
+    max_ns: int
+
+
+class _Shard:
+    __slots__ = ("counts", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * _NUM_BUCKETS
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def merge(self, other: _Shard):
+        for i, num in enumerate(other.counts):
+            if num:
+                self.counts[i] += num
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+
+class LatencyHistogram:
+    # every thread records into its own shard, so recording takes no lock and
+    # snapshots merge the shards
+    def __init__(self):
+        self._local = threading.local()
+        # (thread, shard) pairs, the shards of threads that exited are folded
+        # into `_retired` so short lived threads don't pile up shards
+        self._shards = []
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+
+    def record(self, value_ns: int):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            thread = weakref.ref(threading.current_thread())
+            with self._shards_lock:
+                self._retire_dead_shards()
+                self._shards.append((thread, shard))
+        # `_bucket` inlined, this is the hot path of every timed call
+        shift = value_ns.bit_length() - _SUB_BITS - 1
+        if shift > 0:
+            shard.counts[(shift << _SUB_BITS) + (value_ns >> shift)] += 1
+        else:
+            shard.counts[value_ns] += 1
+        shard.total_ns += value_ns
+        if value_ns > shard.max_ns:
+            shard.max_ns = value_ns
+
+    def counts(self) -> List[int]:
+        return self._merged().counts
+
+    def snapshot(self) -> LatencySnapshot:
+        merged = self._merged()
+        total = sum(merged.counts)
+        p50, p95, p99 = _percentiles(
+            merged.counts, total, (0.5, 0.95, 0.99), merged.max_ns
+        )
+        return LatencySnapshot(
+            total,
+            merged.total_ns / total if total else 0.0,
+            p50,
+            p95,
+            p99,
+            merged.max_ns,
+        )
+
+    def reset(self):
+        with self._shards_lock:
+            self._shards = []
+            self._retired = _Shard()
+            self._local = threading.local()
+
+    def _merged(self) -> _Shard:
+        with self._shards_lock:
+            self._retire_dead_shards()
+            shards = [self._retired] + [shard for _, shard in self._shards]
+        merged = _Shard()
+        for shard in shards:
+            merged.merge(shard)
+        return merged
+
+    def _retire_dead_shards(self):
+        # called holding `_shards_lock`, a thread that exited never records again
+        live = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                live.append((thread_ref, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = live
+
+
+def _bucket(value_ns: int) -> int:
+    shift = value_ns.bit_length() - _SUB_BITS - 1
+    if shift <= 0:
+        return value_ns
+    return (shift << _SUB_BITS) + (value_ns >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = index // _SUB_BUCKETS - 1
+    return ((index - shift * _SUB_BUCKETS + 1) << shift) - 1
+
+
+def _percentiles(counts, total: int, quantiles, max_ns: int) -> List[int]:
+    # the upper bound of the bucket holding each rank, never above the real max,
+    # ranks are rounded first so 0.95 * 100 is rank 95 and not 96
+    res = []
+    ranks = iter([max(1, math.ceil(round(q * total, 9))) for q in quantiles])
+    rank = next(ranks, None)
+    seen = 0
+    for i, num in enumerate(counts):
+        seen += num
+        while rank is not None and seen >= rank:
+            res.append(min(_bucket_upper(i), max_ns))
+            rank = next(ranks, None)
+        if rank is None:
+            break
+    return res + [0] * (len(quantiles) - len(res))
+
+
+class LatencyRecorder(metaclass=SingletonMeta):
+    _histograms_lock = threading.Lock()
+    histograms = {}
+
+    @classmethod
+    def timed(cls, name: str = None) -> Callable:
+        # functions sharing a name share a histogram, by default module.qualname
+        def decorator(func: Callable):
+            histogram = cls.histogram(name or f"{func.__module__}.{func.__qualname__}")
+            clock = time.perf_counter_ns
+            record = histogram.record
+
+            if inspect.iscoroutinefunction(func):
+
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    start = clock()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        record(clock() - start)
+
+            else:
+
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    start = clock()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        record(clock() - start)
+
+            wrapper.histogram = histogram
+            return wrapper
+
+        return decorator
+
+    @classmethod
+    def histogram(cls, name: str) -> LatencyHistogram:
+        with cls._histograms_lock:
+            if name not in cls.histograms:
+                cls.histograms[name] = LatencyHistogram()
+            return cls.histograms[name]
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, LatencySnapshot]:
+        with cls._histograms_lock:
+            histograms = dict(cls.histograms)
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+    @classmethod
+    def to_json(cls) -> str:
+        return json.dumps(
+            {name: snap._asdict() for name, snap in cls.snapshot().items()}, indent=2
+        )
+
+    @classmethod
+    def to_prometheus(cls, metric: str = "function_latency_seconds") -> str:
+        lines = [
+            f"# HELP {metric} Call latency by function.",
+            f"# TYPE {metric} summary",
+        ]
+        max_lines = [
+            f"# HELP {metric}_max Slowest call by function.",
+            f"# TYPE {metric}_max gauge",
+        ]
+        for name, snap in cls.snapshot().items():
+            label = f'function="{_escape_label(name)}"'
+            for quantile, value in (
+                ("0.5", snap.p50_ns),
+                ("0.95", snap.p95_ns),
+                ("0.99", snap.p99_ns),
+            ):
+                lines.append(f'{metric}{{{label},quantile="{quantile}"}} {value / 1e9}')
+            lines.append(f"{metric}_sum{{{label}}} {snap.mean_ns * snap.count / 1e9}")
+            lines.append(f"{metric}_count{{{label}}} {snap.count}")
+            max_lines.append(f"{metric}_max{{{label}}} {snap.max_ns / 1e9}")
+        return "\n".join(lines + max_lines) + "\n"
+
+    @classmethod
+    def export(cls, path: str):
+        # .json files get json, anything else the prometheus text format, the
+        # file is replaced in one step as the node exporter textfile collector
+        # expects
+        text = cls.to_json() if path.endswith(".json") else cls.to_prometheus()
+        atomic_write(path, lambda f: f.write(text.encode()))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def atomic_write(path: str, write: Callable):
+    # `write` fills a temporary file of its own that then replaces `path` in one
+    # step, so readers never see a partial file and concurrent writers never
+    # share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        # temporary files are only readable by their owner
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class MemoryUsage(NamedTuple):
+    # bytes still allocated after the call, the most allocated at once during it
+    # and the sites whose allocations changed most as (file:line, bytes, blocks)
+    net: int
+    peak: int
+    top: List[Tuple[str, int, int]]
+
+
+class _MemoryTrace:
+    __slots__ = ("baseline", "peak", "before", "top_n")
+
+    def __init__(self, baseline: int, before, top_n: int):
+        self.baseline = baseline
+        self.peak = baseline
+        self.before = before
+        self.top_n = top_n
+
+
+# tracemalloc is global to the process, so traces are counted and tracing stops
+# with the last of them, and only if it was started here
+_trace_lock = threading.Lock()
+_active_traces = set()
+_started_tracing = False
+
+
+def start_memory_trace(top_n: int = 0) -> _MemoryTrace:
+    # top_n > 0 diffs snapshots of every allocation, which costs far more than
+    # the net and peak counters
+    global _started_tracing
+    with _trace_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        before = tracemalloc.take_snapshot() if top_n else None
+        trace = _MemoryTrace(_fold_peak(), before, top_n)
+        _active_traces.add(trace)
+    return trace
+
+
+def stop_memory_trace(trace: _MemoryTrace) -> MemoryUsage:
+    global _started_tracing
+    with _trace_lock:
+        if tracemalloc.is_tracing():
+            current = _fold_peak()
+            top = _top_sites(trace) if trace.before is not None else []
+        else:
+            # stopped by someone else, the peak so far is all that's known
+            current, top = trace.baseline, []
+        _active_traces.discard(trace)
+        if not _active_traces and _started_tracing:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            _started_tracing = False
+    return MemoryUsage(
+        current - trace.baseline, max(trace.peak - trace.baseline, 0), top
+    )
+
+
+def _fold_peak() -> int:
+    # called holding `_trace_lock`, the peak since the last trace started or
+    # stopped is reached while every active trace is running, so it counts
+    # towards each of them before it's reset for the next one, without
+    # reset_peak (python < 3.9) peaks reach back to when tracing started
+    current, peak = tracemalloc.get_traced_memory()
+    for trace in _active_traces:
+        trace.peak = max(trace.peak, peak)
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    return current
+
+
+def _top_sites(trace: _MemoryTrace) -> List[Tuple[str, int, int]]:
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    after = tracemalloc.take_snapshot().filter_traces(ignore)
+    stats = after.compare_to(trace.before.filter_traces(ignore), "lineno")
+    return [
+        (str(stat.traceback[0]), stat.size_diff, stat.count_diff)
+        for stat in stats[: trace.top_n]
+        if stat.size_diff or stat.count_diff
+    ]
+
+
+class MemoryProfile:
+    def __init__(self):
+        self.calls = 0
+        self.net_total = 0
+        self.peak_max = 0
+        self.last = None
+        self.sites = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, usage: MemoryUsage):
+        with self._lock:
+            self.calls += 1
+            self.net_total += usage.net
+            self.peak_max = max(self.peak_max, usage.peak)
+            self.last = usage
+            for site, size_diff, _ in usage.top:
+                self.sites[site] += size_diff
+
+    def report(self, limit: int = 10) -> str:
+        with self._lock:
+            lines = [
+                f"{self.calls} calls, net {self.net_total} B, peak {self.peak_max} B"
+            ]
+            lines += [
+                f"{size:>12} B  {site}" for site, size in self.sites.most_common(limit)
+            ]
+        return "\n".join(lines)
+
+
+def profile_memory(top_n: int = 10, every_n: int = None, sample_rate: float = None):
+    # tracemalloc tracks the whole process, so calls that overlap count each
+    # other's allocations, totals build up in `wrapper.memory`
+    _check_sampling(every_n, sample_rate)
+
+    def decorator(func):
+        sampled = _call_sampler(every_n, sample_rate)
+        profile = MemoryProfile()
+
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not sampled():
+                    return await func(*args, **kwargs)
+                trace = _try_start_trace(top_n)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _add_usage(profile, trace)
+
+        else:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not sampled():
+                    return func(*args, **kwargs)
+                trace = _try_start_trace(top_n)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _add_usage(profile, trace)
+
+        wrapper.memory = profile
+        return wrapper
+
+    return decorator
+
+
+# profiling never replaces the call's own result or error, a call whose trace
+# fails is left out of the profile
+def _try_start_trace(top_n: int) -> _MemoryTrace:
+    try:
+        return start_memory_trace(top_n)
+    except Exception:
+        return None
+
+
+def _add_usage(profile: MemoryProfile, trace: _MemoryTrace):
+    if trace is None:
+        return
+    try:
+        profile.add(stop_memory_trace(trace))
+    except Exception:
+        pass
@@ -0,0 +1,320 @@
+import operator
+import re
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .validators import SortedAllowlist
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# dtype kinds where numpy comparisons match the scalar validators
+_VECTORISABLE_KINDS = "biufUS"
+
+_NUMPY_TYPES = (int, float, str, bool)
+
+# dtype kinds numpy may pick for a list holding only values of one type
+_KINDS_BY_TYPE = {bool: "b", int: "iu", float: "f", str: "U", bytes: "S"}
+
+_COMPARISONS = {
+    "eq": operator.eq,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "ge": operator.ge,
+    "le": operator.le,
+}
+
+
+class ConversionError(NamedTuple):
+    index: int
+    op: str
+    value: Any
+    error: Exception
+
+
+class BatchResult:
+    __slots__ = ("validators", "arg_name", "values", "mask")
+
+    def __init__(self, validators, arg_name, values, mask):
+        self.validators = validators
+        self.arg_name = arg_name
+        self.values = values
+        self.mask = mask
+
+    def __len__(self):
+        return len(self.mask)
+
+    @property
+    def ok(self) -> bool:
+        if np is not None and isinstance(self.mask, np.ndarray):
+            return not self.mask.any()
+        return not any(self.mask)
+
+    @property
+    def index(self) -> Sequence[int]:
+        if np is not None and isinstance(self.mask, np.ndarray):
+            return np.flatnonzero(self.mask)
+        return [i for i, failed in enumerate(self.mask) if failed]
+
+    def messages(self, limit: int = None) -> Iterator[Tuple[int, List[str]]]:
+        for count, i in enumerate(self.index):
+            if limit is not None and count >= limit:
+                return
+            fails = []
+            for validator in self.validators:
+                fail = validator(self.arg_name, self.values[i])
+                if fail is not None:
+                    fails.append(repr(fail))
+            yield int(i), fails
+
+
+def validate_batch(
+    validators: Union[Callable, Sequence[Callable]],
+    values: Sequence,
+    arg_name: str = "value",
+) -> BatchResult:
+    if callable(validators):
+        validators = (validators,)
+    validators = tuple(validators)
+
+    arr = _as_vector(values)
+    mask = None
+    for validator in validators:
+        fail_mask = _np_fail_mask(validator, arr) if arr is not None else None
+        if fail_mask is None:
+            fail_mask = _py_fail_mask(validator, values, arg_name)
+            if arr is not None:
+                fail_mask = np.frombuffer(fail_mask, dtype=bool)
+        mask = fail_mask if mask is None else _merge_masks(mask, fail_mask)
+
+    if mask is None:
+        mask = bytearray(len(values))
+        if arr is not None:
+            mask = np.zeros(len(values), dtype=bool)
+    return BatchResult(validators, arg_name, values, mask)
+
+
+def validate_columns(
+    validations: Dict[str, List[Callable]], columns: Dict[str, Sequence]
+) -> Dict[str, BatchResult]:
+    return {
+        arg_name: validate_batch(validations[arg_name], column, arg_name)
+        for arg_name, column in columns.items()
+        if validations.get(arg_name)
+    }
+
+
+def convert_batch(
+    converters: Union[Callable, Sequence[Callable]],
+    values: Sequence,
+    arg_name: str = "value",
+) -> Tuple[Sequence, List[ConversionError]]:
+    # arrays come back as arrays and anything else as a list, whichever path
+    # did the conversion
+    if callable(converters):
+        converters = (converters,)
+    converters = tuple(converters)
+    is_array = np is not None and isinstance(values, np.ndarray)
+
+    arr = _as_vector(values)
+    remaining = converters
+    while arr is not None and remaining:
+        converted = _np_convert(remaining[0], arr)
+        if converted is None:
+            break
+        arr = converted
+        remaining = remaining[1:]
+
+    if not remaining:
+        if arr is None:
+            return (values if is_array else list(values)), []
+        return (arr if is_array else arr.tolist()), []
+    if arr is not None:
+        values = arr.tolist()
+    converted, errors = _py_convert_chain(remaining, values, arg_name)
+    return (_to_array(converted) if is_array else converted), errors
+
+
+def _as_vector(values: Sequence):
+    if np is None:
+        return None
+    if isinstance(values, np.ndarray):
+        arr = values
+    else:
+        # mixed lists are coerced to a common dtype, eg 1 and "1" both become
+        # "1", so only lists of a single type are compared in numpy
+        types = set(map(type, values))
+        if len(types) != 1:
+            return None
+        arr = np.asarray(values)
+        if arr.dtype.kind not in _KINDS_BY_TYPE.get(types.pop(), ""):
+            return None
+    if arr.ndim != 1 or arr.dtype.kind not in _VECTORISABLE_KINDS:
+        return None
+    return arr
+
+
+def _same_kind(values: Sequence, kind: str) -> bool:
+    return all(kind in _KINDS_BY_TYPE.get(type(value), "") for value in values)
+
+
+def _to_array(values: list):
+    # values of one type get their own dtype, anything else stays as objects
+    # rather than being coerced to a common type
+    arr = _as_vector(values)
+    if arr is None:
+        arr = np.empty(len(values), dtype=object)
+        arr[:] = values
+    return arr
+
+
+def _np_sorted_isin(arr, sorted_values):
+    if not len(sorted_values):
+        return np.zeros(arr.shape, dtype=bool)
+    idx = np.searchsorted(sorted_values, arr)
+    idx[idx == len(sorted_values)] = 0
+    return sorted_values[idx] == arr
+
+
+def _merge_masks(mask, other):
+    if isinstance(mask, bytearray):
+        return bytearray(a | b for a, b in zip(mask, other))
+    return mask | other
+
+
+def _np_fail_mask(validator: Callable, arr):
+    op = getattr(validator, "op", None)
+    param = getattr(validator, "param", None)
+    try:
+        if op in _COMPARISONS:
+            passed = _COMPARISONS[op](arr, param)
+        elif op == "is_in" and isinstance(param, SortedAllowlist):
+            passed = _np_sorted_isin(arr, np.asarray(param.values))
+        elif op == "is_in" and not isinstance(param, (str, bytes)):
+            members = list(param)
+            # a mixed allowlist is coerced to one dtype just like mixed values
+            if not _same_kind(members, arr.dtype.kind):
+                return None
+            passed = np.isin(arr, members)
+        elif op in ("max_len", "min_len") and arr.dtype.kind in "US":
+            lengths = np.char.str_len(arr)
+            passed = lengths <= param if op == "max_len" else lengths >= param
+        else:
+            return None
+    except TypeError:
+        return None
+
+    if not isinstance(passed, np.ndarray) or passed.shape != arr.shape:
+        return None
+    return ~passed
+
+
+def _py_fail_mask(validator: Callable, values: Sequence, arg_name: str) -> bytearray:
+    check = to_predicate(validator, arg_name)
+    mask = bytearray(len(values))
+    for i, value in enumerate(values):
+        try:
+            if not check(value):
+                mask[i] = 1
+        except TypeError:
+            mask[i] = 1
+    return mask
+
+
+def to_predicate(validator: Callable, arg_name: str) -> Callable[[Any], bool]:
+    op = getattr(validator, "op", None)
+    param = getattr(validator, "param", None)
+
+    if op == "is_type":
+        return lambda value: isinstance(value, param)
+    if op in _COMPARISONS:
+        compare = _COMPARISONS[op]
+        return lambda value: compare(value, param)
+    if op == "max_len":
+        return lambda value: len(value) <= param
+    if op == "min_len":
+        return lambda value: len(value) >= param
+    if op == "re_match" and isinstance(param, re.Pattern):
+        return param.fullmatch
+    if op == "re_search" and isinstance(param, re.Pattern):
+        return param.search
+    if op == "is_in":
+        return lambda value: value in param
+    if op == "contains":
+        return lambda value: all(val in value for val in param)
+    return lambda value: validator(arg_name, value) is None
+
+
+def _np_convert(converter: Callable, arr):
+    op = getattr(converter, "op", None)
+    param = getattr(converter, "param", None)
+    kind = arr.dtype.kind
+    try:
+        if op == "to_type" and param in _NUMPY_TYPES:
+            return arr.astype(param)
+        if op == "replace_none":
+            # none of the vectorisable dtypes can hold None
+            return arr
+        if op in ("clip_min", "clip_max") and kind in "biuf":
+            # fmax and fmin ignore nan like the scalar converters' max and min
+            clip = np.fmax if op == "clip_min" else np.fmin
+            return clip(arr.astype(float), param)
+        if op == "strip_chars" and kind == "U":
+            return np.char.strip(arr, param)
+        if op == "to_lower" and kind == "U":
+            return np.char.lower(arr)
+        if op == "to_upper" and kind == "U":
+            return np.char.upper(arr)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _py_convert_chain(
+    converters: Sequence[Callable], values: Sequence, arg_name: str
+) -> Tuple[list, List[ConversionError]]:
+    chain = [
+        (getattr(conv, "op", None), _py_convert(conv, arg_name)) for conv in converters
+    ]
+    converted = []
+    errors = []
+    for i, value in enumerate(values):
+        for op, convert in chain:
+            try:
+                value = convert(value)
+            except (TypeError, ValueError) as e:
+                errors.append(ConversionError(i, op, value, e))
+        converted.append(value)
+    return converted, errors
+
+
+def _py_convert(converter: Callable, arg_name: str) -> Callable[[Any], Any]:
+    op = getattr(converter, "op", None)
+    param = getattr(converter, "param", None)
+
+    if op == "to_type":
+        return param
+    if op == "replace_none":
+        return lambda value: value if value is not None else param
+    if op == "clip_min":
+        return lambda value: max(param, float(value))
+    if op == "clip_max":
+        return lambda value: min(param, float(value))
+    if op == "strip_chars":
+        return lambda value: str(value).strip(param)
+    if op == "to_lower":
+        return lambda value: str(value).lower()
+    if op == "to_upper":
+        return lambda value: str(value).upper()
+    return lambda value: converter(arg_name, value)
@@ -0,0 +1,121 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import update_wrapper
+from typing import Any, Callable, List, Tuple
+
+_STOP = object()
+
+
+class MicroBatcher:
+    # callers submit single items, a worker thread collects them into batches of
+    # up to max_size items or whatever arrived within max_wait seconds of the
+    # first one, and calls `func` once per batch with the list of items, `func`
+    # returns one result per item in the same order
+    def __init__(
+        self,
+        func: Callable[[List[Any]], List[Any]],
+        max_size: int = 32,
+        max_wait: float = 0.005,
+        max_queue: int = 1024,
+    ):
+        if max_size < 1:
+            raise ValueError(f"`max_size` must be at least 1. Got: {max_size}.")
+        if max_wait < 0:
+            raise ValueError(f"`max_wait` can't be negative. Got: {max_wait}.")
+        if max_queue < 1:
+            raise ValueError(f"`max_queue` must be at least 1. Got: {max_queue}.")
+        update_wrapper(self, func)
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait
+        # a full queue blocks submitters, so callers can't outrun the batches
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        self._start_worker()
+        self._queue.put((item, future))
+        return future
+
+    async def acall(self, item: Any) -> Any:
+        future = Future()
+        self._start_worker()
+        # never block the event loop on a full queue
+        while True:
+            try:
+                self._queue.put_nowait((item, future))
+                break
+            except queue.Full:
+                await asyncio.sleep(self.max_wait or 0.001)
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        with self._worker_lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join()
+
+    def _start_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is _STOP:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        request = self._queue.get(timeout=remaining)
+                    else:
+                        request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    self._dispatch(batch)
+                    return
+                batch.append(request)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Any, Future]]):
+        # items whose caller has given up are dropped from the batch
+        batch = [
+            (item, future)
+            for item, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        try:
+            results = self.func([item for item, _ in batch])
+            if results is None:
+                # a stage that failed with ActionOnFail.CONTINUE
+                results = [None] * len(batch)
+            elif len(results) != len(batch):
+                raise ValueError(
+                    f"`{self.__name__}` returned {len(results)} results "
+                    f"for {len(batch)} items"
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), res in zip(batch, results):
+            future.set_result(res)
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import types
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from src.useful_decorators.decorators import atomic_write
+
+# fixed so keys written to disk stay valid across python versions
+_PROTOCOL = 4
+
+# pickled fingerprint of each function keyed so far, None if it can't be pickled
+_fingerprints = weakref.WeakKeyDictionary()
+
+
+class StageCache(ABC):
+    def __init__(self, ttl: float = None):
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"`ttl` must be positive. Got: {ttl}.")
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        hit, value = self._load(key)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit, value
+
+    @abstractmethod
+    def store(self, key: str, value: Any):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def _load(self, key: str) -> Tuple[bool, Any]:
+        pass
+
+
+class MemoryCache(StageCache):
+    # values are returned by reference, stages must not mutate what they are given
+    def __init__(self, max_size: int = 128, ttl: float = None):
+        if max_size < 1:
+            raise ValueError(f"`max_size` must be at least 1. Got: {max_size}.")
+        super().__init__(ttl)
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def store(self, key: str, value: Any):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            try:
+                expires, value = self._entries[key]
+            except KeyError:
+                return False, None
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+
+class DiskCache(StageCache):
+    # one pickle per key named by the key, so processes sharing the directory
+    # share results
+    def __init__(self, directory: str, ttl: float = None):
+        super().__init__(ttl)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def store(self, key: str, value: Any):
+        try:
+            payload = pickle.dumps(value, protocol=_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, lambda f: f.write(payload))
+
+    def clear(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(root, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def _load(self, key: str) -> Tuple[bool, Any]:
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if self.ttl is not None and age >= self.ttl:
+                os.remove(path)
+                return False, None
+            with open(path, "rb") as f:
+                payload = f.read()
+        except OSError:
+            return False, None
+        try:
+            return True, pickle.loads(payload)
+        except Exception:
+            # stale entries whose classes have since moved or changed are misses
+            return False, None
+
+
+def stage_key(func: Callable, args: tuple, kwargs: dict) -> Optional[str]:
+    # the function's code is part of the key so editing a stage invalidates its
+    # results, functions and inputs that can't be pickled can't be cached and
+    # give None
+    fingerprint = _fingerprint(func)
+    if fingerprint is None:
+        return None
+    try:
+        payload = pickle.dumps(
+            (fingerprint, _canonical(args), _canonical(sorted(kwargs.items()))),
+            protocol=_PROTOCOL,
+        )
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _fingerprint(func: Callable) -> Optional[bytes]:
+    # taken the first time a function is keyed, so a stage that appends to a
+    # list it closes over doesn't change its own key
+    try:
+        return _fingerprints[func]
+    except (KeyError, TypeError):
+        pass
+    try:
+        fingerprint = _dumps(
+            (func.__module__, func.__qualname__, _func_fingerprint(func))
+        )
+    except (pickle.PicklingError, TypeError, AttributeError):
+        fingerprint = None
+    try:
+        _fingerprints[func] = fingerprint
+    except TypeError:
+        # not weakly referenceable, fingerprinted on every call instead
+        pass
+    return fingerprint
+
+
+def _func_fingerprint(func: Callable, seen: frozenset = frozenset()) -> tuple:
+    # stages built by one factory share their code and only differ in the values
+    # captured by their closure and their defaults
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return None
+    seen = seen | {id(func)}
+    return (
+        _code_fingerprint(code),
+        tuple(_cell_fingerprint(cell, seen) for cell in func.__closure__ or ()),
+        _canonical(func.__defaults__ or ()),
+        _canonical(sorted((func.__kwdefaults__ or {}).items())),
+    )
+
+
+def _cell_fingerprint(cell: types.CellType, seen: frozenset):
+    try:
+        value = cell.cell_contents
+    except ValueError:
+        # a variable the function closes over that isn't assigned yet
+        return "<empty>"
+    # nested helpers can't be pickled by reference, so they're fingerprinted too
+    if isinstance(value, types.FunctionType):
+        return "<recursive>" if id(value) in seen else _func_fingerprint(value, seen)
+    return _canonical(value)
+
+
+def _code_fingerprint(code: types.CodeType) -> tuple:
+    # the repr of a code object holds its address, so nested code is walked instead
+    consts = tuple(
+        _code_fingerprint(const) if isinstance(const, types.CodeType) else repr(const)
+        for const in code.co_consts
+    )
+    return code.co_code, consts, code.co_names
+
+
+def _canonical(value):
+    # sets pickle in hash order, which changes between processes
+    if isinstance(value, (set, frozenset)):
+        items = [_canonical(item) for item in value]
+        return type(value).__name__, sorted(items, key=_dumps)
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return type(value).__name__, [
+            (_canonical(k), _canonical(v)) for k, v in value.items()
+        ]
+    return value
+
+
+def _dumps(value) -> bytes:
+    return pickle.dumps(value, protocol=_PROTOCOL)
@@ -0,0 +1,104 @@
+import json
+import os
+import pickle
+from typing import Any, List, Sequence, Tuple
+
+from src.useful_decorators.decorators import atomic_write
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+_MANIFEST = "manifest.json"
+
+
+class CheckpointStore:
+    # keeps the output of each completed stage of one pipeline in `directory`,
+    # the manifest lists them in stage order
+    def __init__(self, directory: str, stage_names: Sequence[str]):
+        self.directory = directory
+        self.stage_names = list(stage_names)
+        os.makedirs(directory, exist_ok=True)
+        self.completed = self._read_manifest()
+
+    def resume(self, data: Any) -> Tuple[int, Any]:
+        # returns the stage to start from and its input
+        if not self.completed:
+            return 0, data
+        return len(self.completed), load_checkpoint(
+            os.path.join(self.directory, self.completed[-1])
+        )
+
+    def reset(self):
+        self._truncate(0)
+        self._write_manifest()
+
+    def save(self, stage: int, value: Any):
+        self._truncate(stage)
+        base = os.path.join(self.directory, f"{stage:03d}_{self.stage_names[stage]}")
+        self.completed.append(os.path.basename(save_checkpoint(base, value)))
+        self._write_manifest()
+
+    def _read_manifest(self) -> List[str]:
+        try:
+            with open(os.path.join(self.directory, _MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return []
+        # only the leading stages that are unchanged since the checkpoints were saved
+        saved_names = manifest.get("stages", [])
+        completed = []
+        for stage, file in enumerate(manifest.get("completed", [])):
+            if saved_names[: stage + 1] != self.stage_names[: stage + 1]:
+                break
+            completed.append(file)
+        return completed
+
+    def _truncate(self, stage: int):
+        for file in self.completed[stage:]:
+            path = os.path.join(self.directory, file)
+            if os.path.exists(path):
+                os.remove(path)
+        del self.completed[stage:]
+
+    def _write_manifest(self):
+        manifest = {"stages": self.stage_names, "completed": self.completed}
+        atomic_write(
+            os.path.join(self.directory, _MANIFEST),
+            lambda f: f.write(json.dumps(manifest).encode()),
+        )
+
+
+def save_checkpoint(base: str, value: Any) -> str:
+    # numpy arrays and arrow tables get formats that can be memory mapped back
+    if np is not None and type(value) is np.ndarray and value.dtype != object:
+        path = f"{base}.npy"
+        atomic_write(path, lambda f: np.save(f, value, allow_pickle=False))
+    elif pa is not None and isinstance(value, pa.Table):
+        path = f"{base}.arrow"
+        atomic_write(path, lambda f: _write_arrow(f, value))
+    else:
+        path = f"{base}.pkl"
+        atomic_write(path, lambda f: pickle.dump(value, f))
+    return path
+
+
+def load_checkpoint(path: str) -> Any:
+    if path.endswith(".npy"):
+        # copy on write, so later stages can modify the array without touching disk
+        return np.load(path, mmap_mode="c")
+    if path.endswith(".arrow"):
+        return pa.ipc.open_file(pa.memory_map(path)).read_all()
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _write_arrow(f, table):
+    with pa.ipc.new_file(f, table.schema) as writer:
+        writer.write_table(table)
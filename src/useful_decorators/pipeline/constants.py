@@ -6,11 +6,32 @@ class PipeKey(Enum):
     ARGS = "args"
     KWARGS = "kwargs"
     RETURN = "return"
+    ITEMS = "items"
     EXCEPTIONS = "exceptions"
-    START_TIME = "start_time"
-    END_TIME = "end_time"
+    START_NS = "start_ns"
+    END_NS = "end_ns"
+    DURATION_NS = "duration_ns"
+    CPU_NS = "cpu_ns"
+    MEMORY_PEAK = "memory_peak"
+    MEMORY_NET = "memory_net"
+    MEMORY_TOP = "memory_top"
+    CACHE = "cache"
+    ATTEMPTS = "attempts"
+    RETRY_WAIT_NS = "retry_wait_ns"
 
 
 class ActionOnFail(Enum):
     CONTINUE = "continue"
     BREAK = "break"
+    RETRY = "retry"
+
+
+class CacheStatus(Enum):
+    HIT = "hit"
+    MISS = "miss"
+    UNHASHABLE = "unhashable"
+
+
+class Executor(Enum):
+    THREAD = "thread"
+    PROCESS = "process"
@@ -1,7 +1,10 @@
 from typing import Any
 
+from .validators import rule
+
 
 def to_type(dst_type: type):
+    @rule("to_type", dst_type)
     def wrapper(arg_name: str, arg_value: Any):
         try:
             return dst_type(arg_value)
@@ -15,6 +18,7 @@ def to_type(dst_type: type):
 
 
 def replace_none(default_value: Any):
+    @rule("replace_none", default_value)
     def wrapper(arg_name: str, arg_value: Any):
         return arg_value if arg_value is not None else default_value
 
@@ -22,6 +26,7 @@ def replace_none(default_value: Any):
 
 
 def clip_min(min_value: float):
+    @rule("clip_min", min_value)
     def wrapper(arg_name: str, arg_value: Any):
         try:
             return max(min_value, float(arg_value))
@@ -35,6 +40,7 @@ def clip_min(min_value: float):
 
 
 def clip_max(max_value: float):
+    @rule("clip_max", max_value)
     def wrapper(arg_name: str, arg_value: Any):
         try:
             return min(max_value, float(arg_value))
@@ -48,6 +54,7 @@ def clip_max(max_value: float):
 
 
 def strip_chars(chars: str):
+    @rule("strip_chars", chars)
     def wrapper(arg_name: str, arg_value: Any):
         try:
             return str(arg_value).strip(chars)
@@ -61,6 +68,7 @@ def strip_chars(chars: str):
 
 
 def to_lower():
+    @rule("to_lower")
     def wrapper(arg_name: str, arg_value: Any):
         try:
             return str(arg_value).lower()
@@ -74,6 +82,7 @@ def to_lower():
 
 
 def to_upper():
+    @rule("to_upper")
     def wrapper(arg_name: str, arg_value: Any):
         try:
             return str(arg_value).upper()
@@ -0,0 +1,134 @@
+import operator
+from typing import Any, Callable, Optional, Sequence
+
+from .batch import to_predicate
+
+# relative cost of a validator by op, untagged validators are assumed mid-range
+RULE_COSTS = {
+    "is_type": 0,
+    "eq": 1,
+    "gt": 1,
+    "lt": 1,
+    "ge": 1,
+    "le": 1,
+    "min_len": 2,
+    "max_len": 2,
+    "is_in": 2,
+    "contains": 4,
+    "re_match": 5,
+    "re_search": 5,
+}
+_DEFAULT_COST = 3
+
+_LOWER_BOUNDS = {"gt": operator.gt, "ge": operator.ge}
+_UPPER_BOUNDS = {"lt": operator.lt, "le": operator.le}
+
+
+def fuse_validators(
+    validators: Sequence[Callable], arg_name: str
+) -> Optional[Callable[[Any], bool]]:
+    # the fused predicate only decides whether a value is accepted, rejected values
+    # are re-run through the original validators so the failures are unchanged
+    if not validators:
+        return None
+
+    by_op = {}
+    for validator in validators:
+        by_op.setdefault(getattr(validator, "op", None), []).append(validator)
+
+    predicates = []
+    types = [validator.param for validator in by_op.pop("is_type", ())]
+    if types:
+        predicates.append(_type_check(types))
+
+    lower = [(op, v.param) for op in _LOWER_BOUNDS for v in by_op.pop(op, ())]
+    upper = [(op, v.param) for op in _UPPER_BOUNDS for v in by_op.pop(op, ())]
+    if len(lower) == 1 and len(upper) == 1:
+        predicates.append(_range_check(*lower[0], *upper[0]))
+    else:
+        predicates += [_bound_check(op, limit) for op, limit in lower + upper]
+
+    min_lens = [v.param for v in by_op.pop("min_len", ())]
+    max_lens = [v.param for v in by_op.pop("max_len", ())]
+    if min_lens or max_lens:
+        min_len = max(min_lens, default=0)
+        predicates.append(_len_check(min_len, min(max_lens, default=None)))
+
+    for group in sorted(by_op.values(), key=lambda group: rule_cost(group[0])):
+        predicates += [to_predicate(validator, arg_name) for validator in group]
+
+    return _all_of(predicates)
+
+
+def rule_cost(validator: Callable) -> int:
+    return RULE_COSTS.get(getattr(validator, "op", None), _DEFAULT_COST)
+
+
+def _all_of(predicates: Sequence[Callable[[Any], bool]]) -> Callable[[Any], bool]:
+    predicates = tuple(predicates)
+    if len(predicates) == 1:
+        (predicate,) = predicates
+    else:
+
+        def predicate(value):
+            for check in predicates:
+                if not check(value):
+                    return False
+            return True
+
+    def accept(value):
+        try:
+            return bool(predicate(value))
+        except TypeError:
+            return False
+
+    return accept
+
+
+def _type_check(types: list) -> Callable[[Any], bool]:
+    if len(types) == 1:
+        (arg_type,) = types
+        return lambda value: isinstance(value, arg_type)
+
+    flat_types = [t for arg_type in types for t in _as_tuple(arg_type)]
+    if any(type(t) is not type for t in flat_types):
+        # metaclasses like ABCMeta can answer differently for instances of one type
+        return lambda value: all(isinstance(value, t) for t in types)
+
+    verdicts = {}
+
+    def check(value):
+        value_type = type(value)
+        try:
+            return verdicts[value_type]
+        except KeyError:
+            verdict = all(isinstance(value, t) for t in types)
+            verdicts[value_type] = verdict
+            return verdict
+
+    return check
+
+
+def _as_tuple(arg_type) -> tuple:
+    return arg_type if isinstance(arg_type, tuple) else (arg_type,)
+
+
+def _bound_check(op: str, limit: Any) -> Callable[[Any], bool]:
+    compare = {**_LOWER_BOUNDS, **_UPPER_BOUNDS}[op]
+    return lambda value: compare(value, limit)
+
+
+def _range_check(lower_op: str, lower, upper_op: str, upper) -> Callable[[Any], bool]:
+    if lower_op == "ge" and upper_op == "le":
+        return lambda value: value >= lower and value <= upper
+    if lower_op == "ge":
+        return lambda value: value >= lower and value < upper
+    if upper_op == "le":
+        return lambda value: value > lower and value <= upper
+    return lambda value: value > lower and value < upper
+
+
+def _len_check(min_len: int, max_len: Optional[int]) -> Callable[[Any], bool]:
+    if max_len is None:
+        return lambda value: len(value) >= min_len
+    return lambda value: min_len <= len(value) <= max_len
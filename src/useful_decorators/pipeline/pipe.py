@@ -1,58 +1,890 @@
-from datetime import datetime, timezone
-from functools import wraps
+import asyncio
+import contextvars
+import importlib
+import inspect
+import multiprocessing
+import pickle
+import queue
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Sized
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import contextmanager
+from functools import partial, wraps
+from itertools import count, islice
+from typing import Dict, List, NamedTuple, Sequence, Union
 
+from src.useful_decorators.decorators import (
+    RetryPolicy,
+    start_memory_trace,
+    stop_memory_trace,
+)
 from src.useful_decorators.metaclasses import SingletonMeta
 
-from .constants import ActionOnFail, PipeKey
+from .batching import MicroBatcher
+from .cache import StageCache, stage_key
+from .checkpoint import CheckpointStore
+from .constants import ActionOnFail, CacheStatus, Executor, PipeKey
+
+# forking a process that runs other threads can deadlock the child, so stages
+# that time out in a process start it fresh
+_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# how long a stage's child process gets to start and import the stage before
+# its own timeout begins, a child that can't start in time is terminated
+_START_TIMEOUT = 30.0
+
+
+class StageTiming(NamedTuple):
+    stage: int
+    func: str
+    start_ns: int
+    end_ns: int
+    duration_ns: int
+    cpu_ns: int
+    memory_peak: int = None
+
+
+class PipeRun:
+    __slots__ = ("run_id", "log", "stage_ids", "max_entries", "metadata_only")
+
+    def __init__(
+        self,
+        run_id: int,
+        log: dict = None,
+        max_entries: int = None,
+        metadata_only: bool = False,
+    ):
+        self.run_id = run_id
+        self.log = {} if log is None else log
+        # next() on a count is atomic, so stages of one run never need a lock
+        self.stage_ids = count(len(self.log))
+        # on top of `Pipe.configure_log`, a run can only retain less
+        self.max_entries = max_entries
+        self.metadata_only = metadata_only
+
+    def __repr__(self):
+        return f"PipeRun(run_id={self.run_id}, stages={len(self.log)})"
+
+
+# the run the current thread or asyncio task is logging into, None outside of a run
+_current_run = contextvars.ContextVar("current_run", default=None)
+_last_run = contextvars.ContextVar("last_run", default=None)
 
 
 class Pipe(metaclass=SingletonMeta):
+    _log_lock = threading.Lock()
+    # pairs the monotonic clock with the wall clock so stage times can be anchored
+    _anchor_ns = (time.time_ns(), time.perf_counter_ns())
+    _run_ids = count()
+    # stages called outside of a run log here
     log = {}
     stage_count = 0
+    # the newest runs, see `configure_log`
+    runs = deque(maxlen=1000)
+    # retention, see `configure_log`
+    log_max_entries = None
+    log_sample_rate = 1.0
+    log_metadata_only = False
+
+    @classmethod
+    def configure_log(
+        cls,
+        max_entries: int = None,
+        sample_rate: float = 1.0,
+        metadata_only: bool = False,
+        max_runs: int = 1000,
+    ):
+        # max_entries keeps only the newest entries of each log, sample_rate logs
+        # that fraction of stage calls, metadata_only drops references to the
+        # stage's data and max_runs keeps only the newest runs, None keeps all
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f"`max_entries` must be at least 1. Got: {max_entries}.")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"`sample_rate` must be in [0, 1]. Got: {sample_rate}.")
+        if max_runs is not None and max_runs < 1:
+            raise ValueError(f"`max_runs` must be at least 1. Got: {max_runs}.")
+        with cls._log_lock:
+            cls.log_max_entries = max_entries
+            cls.log_sample_rate = sample_rate
+            cls.log_metadata_only = metadata_only
+            cls.runs = deque(cls.runs, maxlen=max_runs)
+            _evict(cls.log, max_entries)
+
+    @classmethod
+    @contextmanager
+    def run_context(cls):
+        # a run nested in another run logs into the outer one
+        run = _current_run.get()
+        if run is not None:
+            yield run
+            return
+        run = cls._new_run()
+        token = _current_run.set(run)
+        _last_run.set(run)
+        try:
+            yield run
+        finally:
+            _current_run.reset(token)
+
+    @classmethod
+    def current_run(cls) -> PipeRun:
+        return _current_run.get()
+
+    @classmethod
+    def last_run(cls) -> PipeRun:
+        # the most recent run started from the calling thread or asyncio task
+        return _last_run.get()
+
+    @classmethod
+    def global_log(cls) -> dict:
+        # copying a dict or deque happens under the GIL, so the view is built
+        # from consistent snapshots without stopping the runs that are logging
+        view = {(None, stage): entry for stage, entry in cls.log.copy().items()}
+        for run in cls.runs.copy():
+            for stage, entry in run.log.copy().items():
+                view[(run.run_id, stage)] = entry
+        return view
 
     @classmethod
     def stage(
         cls,
         action_on_fail: str = ActionOnFail.BREAK.value,
+        track_memory: Union[bool, int] = False,
+        cache: StageCache = None,
+        depends_on: Sequence = (),
+        retry_policy: RetryPolicy = None,
+        timeout: float = None,
+        timeout_backend: str = Executor.THREAD.value,
     ):
-        def decorator(func):
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                curr_stage = cls.stage_count
+        # depends_on lists the stages whose results this stage takes in `run_dag`,
+        # retry_policy configures ActionOnFail.RETRY which breaks once it gives up
+        # and timeout is in seconds per attempt, the process timeout_backend needs
+        # a module level stage with picklable arguments and results
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"`timeout` must be positive. Got: {timeout}.")
+        retrying = action_on_fail == ActionOnFail.RETRY.value
+        if retry_policy is not None and not retrying:
+            raise ValueError(
+                "`retry_policy` needs `action_on_fail` to be "
+                f"{ActionOnFail.RETRY.value}. Got: {action_on_fail}."
+            )
+        retry_policy = retry_policy or (RetryPolicy() if retrying else None)
 
-                cls.log[curr_stage] = {
-                    PipeKey.FUNC.value: func.__name__,
-                    PipeKey.ARGS.value: args,
-                    PipeKey.KWARGS.value: kwargs,
-                    PipeKey.EXCEPTIONS.value: [],
-                    PipeKey.START_TIME.value: str(datetime.now(timezone.utc)),
-                }
-
-                try:
-                    res = func(*args, **kwargs)
-                    cls.log[curr_stage][PipeKey.RETURN.value] = res
-                except Exception as e:
-                    cls.log[curr_stage][PipeKey.EXCEPTIONS.value].append(e)
-
-                cls.log[curr_stage][PipeKey.END_TIME.value] = str(
-                    datetime.now(timezone.utc)
+        def decorator(func):
+            if cache is not None and inspect.isgeneratorfunction(func):
+                raise TypeError(f"Generator stage `{func.__name__}` can't be cached")
+            if retrying and inspect.isgeneratorfunction(func):
+                raise TypeError(
+                    f"Generator stage `{func.__name__}` can't be retried, "
+                    "its items may already have been consumed"
                 )
-                cls.stage_count += 1
+            if timeout is not None and inspect.isgeneratorfunction(func):
+                raise TypeError(f"Generator stage `{func.__name__}` can't time out")
+            timed = func if timeout is None else _timed(func, timeout, timeout_backend)
 
-                if (
-                    action_on_fail == ActionOnFail.CONTINUE.value
-                    or not cls.log[curr_stage][PipeKey.EXCEPTIONS.value]
-                ):
+            def call(entry, args, kwargs):
+                if not retrying:
+                    return timed(*args, **kwargs)
+                entry[PipeKey.ATTEMPTS.value] = 1
+                on_retry = partial(cls._record_retry, entry)
+                if inspect.iscoroutinefunction(func):
+                    return retry_policy.acall(timed, args, kwargs, on_retry)
+                return retry_policy.call(timed, args, kwargs, on_retry)
+
+            if inspect.isgeneratorfunction(func):
+
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    # items are passed straight through, only their count is logged
+                    entry = cls._open_stage(func, args, kwargs, track_memory)
+                    num_items = 0
+                    error = None
+                    try:
+                        for item in func(*args, **kwargs):
+                            num_items += 1
+                            yield item
+                    except GeneratorExit:
+                        entry[PipeKey.ITEMS.value] = num_items
+                        cls._close_stage(entry, action_on_fail, None, track_memory)
+                        raise
+                    except Exception as e:
+                        error = e
+                    entry[PipeKey.ITEMS.value] = num_items
+                    cls._close_stage(entry, action_on_fail, error, track_memory)
+
+            elif inspect.iscoroutinefunction(func):
+
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    entry = cls._open_stage(func, args, kwargs, track_memory)
+                    res = error = None
+                    try:
+                        key, hit, res = _cache_lookup(cache, entry, func, args, kwargs)
+                        if not hit:
+                            res = await call(entry, args, kwargs)
+                            if key is not None:
+                                cache.store(key, res)
+                        entry[PipeKey.RETURN.value] = cls._retain(
+                            res, _current_run.get()
+                        )
+                    except Exception as e:
+                        error = e
+                    cls._close_stage(entry, action_on_fail, error, track_memory)
                     return res
-                raise cls.log[curr_stage][PipeKey.EXCEPTIONS.value][-1]
 
+            else:
+
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    entry = cls._open_stage(func, args, kwargs, track_memory)
+                    res = error = None
+                    try:
+                        key, hit, res = _cache_lookup(cache, entry, func, args, kwargs)
+                        if not hit:
+                            res = call(entry, args, kwargs)
+                            if key is not None:
+                                cache.store(key, res)
+                        entry[PipeKey.RETURN.value] = cls._retain(
+                            res, _current_run.get()
+                        )
+                    except Exception as e:
+                        error = e
+                    cls._close_stage(entry, action_on_fail, error, track_memory)
+                    return res
+
+            wrapper.depends_on = tuple(depends_on)
             return wrapper
 
         return decorator
 
     @classmethod
-    def run(cls, stages, data):
+    def batch_stage(
+        cls,
+        action_on_fail: str = ActionOnFail.BREAK.value,
+        max_size: int = 32,
+        max_wait: float = 0.005,
+        max_queue: int = 1024,
+        track_memory: Union[bool, int] = False,
+    ):
+        # the decorated function takes a list of items and returns a list of
+        # results, the stage is called with one item at a time and each call to
+        # the function is logged as one stage, outside of any run
+        def decorator(func):
+            if inspect.iscoroutinefunction(func) or inspect.isgeneratorfunction(func):
+                raise TypeError(f"Batch stage `{func.__name__}` must be a function")
+            return MicroBatcher(
+                cls.stage(action_on_fail, track_memory)(func),
+                max_size,
+                max_wait,
+                max_queue,
+            )
+
+        return decorator
+
+    @classmethod
+    def run(cls, stages, data, checkpoint_dir: str = None, resume: bool = False):
+        # with a checkpoint_dir every completed stage's output is saved, resume
+        # picks up after the last stage that completed with the same stages
+        stages = list(stages)
+        start = 0
+        checkpoints = None
+        if checkpoint_dir is not None:
+            checkpoints = CheckpointStore(
+                checkpoint_dir, [stage.__name__ for stage in stages]
+            )
+            if resume:
+                start, data = checkpoints.resume(data)
+            else:
+                checkpoints.reset()
+
+        with cls.run_context():
+            for i in range(start, len(stages)):
+                data = stages[i](data)
+                if checkpoints is not None:
+                    checkpoints.save(i, data)
+
+        return data
+
+    @classmethod
+    def stream(
+        cls,
+        stages,
+        data,
+        prefetch: int = 0,
+        max_log_entries: int = 1024,
+        metadata_only: bool = True,
+    ):
+        # generator stages consume the upstream iterator, plain stages are mapped
+        # over it item by item, so nothing is materialised between stages, a
+        # plain stage logs once per item so by default the run keeps only the
+        # newest max_log_entries entries and no references to the items, a
+        # stream inside another run logs with that run's retention
+        if max_log_entries is not None and max_log_entries < 1:
+            raise ValueError(
+                f"`max_log_entries` must be at least 1. Got: {max_log_entries}."
+            )
+        run = _current_run.get() or cls._new_run(
+            max_entries=max_log_entries, metadata_only=metadata_only
+        )
+        _last_run.set(run)
+        data = iter(data)
         for stage in stages:
-            data = stage(data)
+            if inspect.isgeneratorfunction(stage):
+                data = stage(data)
+            else:
+                data = map(stage, data)
+            if prefetch:
+                data = _prefetch(data, prefetch)
+
+        return _bind_run(run, data)
+
+    @classmethod
+    def run_many(
+        cls,
+        stages,
+        items,
+        executor: str = Executor.THREAD.value,
+        max_workers: int = None,
+        chunksize: int = 1,
+        ordered: bool = True,
+    ):
+        # stages must be importable module level functions for the process executor
+        pool_cls = {
+            Executor.THREAD.value: ThreadPoolExecutor,
+            Executor.PROCESS.value: ProcessPoolExecutor,
+        }[executor]
+        in_process = executor == Executor.PROCESS.value
+
+        with pool_cls(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_run_chunk, stages, chunk, in_process)
+                for chunk in _chunks(items, chunksize)
+            ]
+            done = futures if ordered else as_completed(futures)
+
+            results = []
+            try:
+                for future in done:
+                    for res, run_log, failed in future.result():
+                        if run_log is not None:
+                            cls._new_run(run_log)
+                        if failed:
+                            raise res
+                        results.append(res)
+            except BaseException:
+                # otherwise the pool runs every queued chunk before the error
+                # reaches the caller
+                for pending in futures:
+                    pending.cancel()
+                raise
+
+        return results
+
+    @classmethod
+    def run_dag(
+        cls,
+        stages,
+        data,
+        executor: str = Executor.THREAD.value,
+        max_workers: int = None,
+    ) -> Dict[str, object]:
+        # stages without dependencies take `data`, the others take the results of
+        # their dependencies in the order they were declared, every stage is
+        # submitted as soon as its dependencies are done
+        dependents = _check_dag(stages)
+        pool_cls = {
+            Executor.THREAD.value: ThreadPoolExecutor,
+            Executor.PROCESS.value: ProcessPoolExecutor,
+        }[executor]
+        in_process = executor == Executor.PROCESS.value
+        waiting = {stage: len(_dependencies(stage)) for stage in stages}
+        results = {}
+
+        with cls.run_context() as run, pool_cls(max_workers=max_workers) as pool:
+
+            def submit(stage):
+                args = tuple(results[dep] for dep in _dependencies(stage)) or (data,)
+                if in_process:
+                    return pool.submit(_run_in_process, stage, args)
+                # threads don't inherit context variables, so the run is passed on
+                return pool.submit(contextvars.copy_context().run, stage, *args)
+
+            running = {submit(stage): stage for stage in stages if not waiting[stage]}
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        res = future.result()
+                        if in_process:
+                            res, run_log, error = res
+                            cls._merge_run_log(run, run_log)
+                            if error is not None:
+                                raise error
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        raise
+                    results[stage] = res
+                    for dependent in dependents[stage]:
+                        waiting[dependent] -= 1
+                        if not waiting[dependent]:
+                            running[submit(dependent)] = dependent
+
+        return {stage.__name__: results[stage] for stage in stages}
+
+    @classmethod
+    async def arun(cls, stages, data):
+        with cls.run_context():
+            for stage in stages:
+                data = stage(data)
+                if inspect.isawaitable(data):
+                    data = await data
 
         return data
+
+    @classmethod
+    def timings(
+        cls, wall_clock: bool = False, run: PipeRun = None
+    ) -> List[StageTiming]:
+        # without `run` the timings are those of the last run started from
+        # this thread or task, or of stages called outside any run
+        offset = cls._anchor_ns[0] - cls._anchor_ns[1] if wall_clock else 0
+        if run is None:
+            run = cls.last_run()
+        if run is None:
+            with cls._log_lock:
+                entries = list(cls.log.items())
+        else:
+            entries = list(run.log.copy().items())
+        return [
+            StageTiming(
+                stage,
+                entry[PipeKey.FUNC.value],
+                entry[PipeKey.START_NS.value] + offset,
+                entry[PipeKey.END_NS.value] + offset,
+                entry[PipeKey.DURATION_NS.value],
+                entry[PipeKey.CPU_NS.value],
+                entry.get(PipeKey.MEMORY_PEAK.value),
+            )
+            for stage, entry in entries
+            if PipeKey.END_NS.value in entry
+        ]
+
+    @classmethod
+    def _open_stage(
+        cls, func, args, kwargs, track_memory: Union[bool, int] = False
+    ) -> dict:
+        # the stage number is claimed up front so interleaved async stages
+        # never share a log entry
+        run = _current_run.get()
+        entry = {
+            PipeKey.FUNC.value: func.__name__,
+            PipeKey.ARGS.value: cls._retain(args, run),
+            PipeKey.KWARGS.value: cls._retain(kwargs, run),
+            PipeKey.EXCEPTIONS.value: [],
+        }
+        if track_memory:
+            # holds the trace until the stage closes
+            entry[PipeKey.MEMORY_PEAK.value] = start_memory_trace(
+                _memory_top_n(track_memory)
+            )
+        sampled = cls.log_sample_rate >= 1.0 or random.random() < cls.log_sample_rate
+        if run is None:
+            with cls._log_lock:
+                curr_stage = cls.stage_count
+                cls.stage_count += 1
+                if sampled:
+                    cls.log[curr_stage] = entry
+                    _evict(cls.log, cls.log_max_entries)
+        else:
+            curr_stage = next(run.stage_ids)
+            if sampled:
+                run.log[curr_stage] = entry
+                _evict(run.log, cls._max_entries(run))
+
+        # holds the starting cpu time until the stage closes, async stages also
+        # count whatever else the thread ran while they were awaiting
+        entry[PipeKey.CPU_NS.value] = time.thread_time_ns()
+        entry[PipeKey.START_NS.value] = time.perf_counter_ns()
+        return entry
+
+    @classmethod
+    def _merge_run_log(cls, run: PipeRun, run_log: dict):
+        for entry in run_log.values():
+            run.log[next(run.stage_ids)] = entry
+        _evict(run.log, cls._max_entries(run))
+
+    @classmethod
+    def _new_run(cls, log: dict = None, **retention) -> PipeRun:
+        run = PipeRun(next(cls._run_ids), log, **retention)
+        # `configure_log` may be replacing the deque
+        with cls._log_lock:
+            cls.runs.append(run)
+        return run
+
+    @classmethod
+    def _max_entries(cls, run: PipeRun) -> int:
+        limits = [
+            limit
+            for limit in (cls.log_max_entries, run.max_entries)
+            if limit is not None
+        ]
+        return min(limits) if limits else None
+
+    @classmethod
+    def _metadata_only(cls, run: PipeRun = None) -> bool:
+        return cls.log_metadata_only or (run is not None and run.metadata_only)
+
+    @classmethod
+    def _retain(cls, value, run: PipeRun = None):
+        return _describe(value) if cls._metadata_only(run) else value
+
+    @classmethod
+    def _record_retry(cls, entry: dict, error: Exception, delay: float):
+        entry[PipeKey.ATTEMPTS.value] += 1
+        entry[PipeKey.RETRY_WAIT_NS.value] = entry.get(
+            PipeKey.RETRY_WAIT_NS.value, 0
+        ) + int(delay * 1e9)
+        entry[PipeKey.EXCEPTIONS.value].append(
+            type(error) if cls._metadata_only(_current_run.get()) else error
+        )
+
+    @classmethod
+    def _close_stage(
+        cls,
+        entry: dict,
+        action_on_fail: str,
+        error: Exception = None,
+        track_memory: Union[bool, int] = False,
+    ):
+        end_ns = time.perf_counter_ns()
+        cpu_start_ns = entry[PipeKey.CPU_NS.value]
+        entry[PipeKey.CPU_NS.value] = time.thread_time_ns() - cpu_start_ns
+        entry[PipeKey.DURATION_NS.value] = end_ns - entry[PipeKey.START_NS.value]
+        if track_memory:
+            usage = stop_memory_trace(entry[PipeKey.MEMORY_PEAK.value])
+            entry[PipeKey.MEMORY_PEAK.value] = usage.peak
+            entry[PipeKey.MEMORY_NET.value] = usage.net
+            if _memory_top_n(track_memory):
+                entry[PipeKey.MEMORY_TOP.value] = usage.top
+        # set last, readers take an entry with END_NS as finished
+        entry[PipeKey.END_NS.value] = end_ns
+
+        if error is None:
+            return
+        entry[PipeKey.EXCEPTIONS.value].append(
+            type(error) if cls._metadata_only(_current_run.get()) else error
+        )
+        if action_on_fail != ActionOnFail.CONTINUE.value:
+            raise error
+
+
+def _timed(func, timeout: float, backend: str):
+    if inspect.iscoroutinefunction(func):
+
+        async def timed(*args, **kwargs):
+            # cancels the stage's task when it runs over
+            try:
+                return await asyncio.wait_for(func(*args, **kwargs), timeout)
+            except asyncio.TimeoutError:
+                raise _timeout_error(func, timeout) from None
+
+        return timed
+    if backend == Executor.PROCESS.value:
+        return partial(_call_in_process, func, timeout)
+    return partial(_call_in_thread, func, timeout)
+
+
+def _timeout_error(func, timeout: float) -> TimeoutError:
+    return TimeoutError(f"`{func.__name__}` timed out after {timeout}s")
+
+
+def _call_in_thread(func, timeout: float, *args, **kwargs):
+    # python threads can't be interrupted, a stage that runs over is abandoned
+    # and finishes in the background
+    outcome = []
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            outcome.append((True, context.run(func, *args, **kwargs)))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if not outcome:
+        raise _timeout_error(func, timeout)
+    ok, value = outcome[0]
+    if not ok:
+        raise value
+    return value
+
+
+def _call_in_process(func, timeout: float, *args, **kwargs):
+    # a stage that runs over is terminated, the child imports the stage and gets
+    # pickled arguments, so whatever the stage changes there, like globals or
+    # its arguments, is lost and only its result comes back
+    try:
+        importable = _resolve(func.__module__, func.__qualname__) is func
+    except (ImportError, AttributeError):
+        importable = False
+    if not importable:
+        raise TypeError(
+            f"`{func.__name__}` must be a module level function to run with "
+            f"timeout_backend='{Executor.PROCESS.value}'"
+        )
+    mp_context = multiprocessing.get_context(_START_METHOD)
+    receiver, sender = mp_context.Pipe(duplex=False)
+    process = mp_context.Process(
+        target=_send_outcome,
+        args=(sender, func.__module__, func.__qualname__, args, kwargs),
+        daemon=True,
+    )
+    try:
+        process.start()
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        receiver.close()
+        raise TypeError(
+            f"The arguments of `{func.__name__}` must be picklable to run with "
+            f"timeout_backend='{Executor.PROCESS.value}'"
+        ) from e
+    finally:
+        sender.close()
+    try:
+        # the timeout starts once the child has imported the stage, it sends
+        # None then, or the error it failed with
+        if not receiver.poll(max(timeout, _START_TIMEOUT)):
+            process.terminate()
+            raise TimeoutError(
+                f"`{func.__name__}` didn't start within {max(timeout, _START_TIMEOUT)}s"
+            )
+        outcome = receiver.recv()
+        if outcome is None:
+            if not receiver.poll(timeout):
+                process.terminate()
+                raise _timeout_error(func, timeout)
+            outcome = receiver.recv()
+        ok, value = outcome
+    except EOFError:
+        process.join()
+        raise RuntimeError(
+            f"`{func.__name__}` exited with code {process.exitcode}"
+        ) from None
+    finally:
+        receiver.close()
+        process.join()
+    if not ok:
+        raise value
+    return value
+
+
+def _send_outcome(sender, module: str, qualname: str, args, kwargs):
+    try:
+        func = _resolve(module, qualname)
+        sender.send(None)
+        outcome = True, func(*args, **kwargs)
+    except Exception as e:
+        outcome = False, e
+    try:
+        sender.send(outcome)
+    except Exception as e:
+        sender.send((False, e))
+    finally:
+        sender.close()
+
+
+def _resolve(module: str, qualname: str):
+    # a stage's name is bound to its wrapper, which holds the function it wraps
+    obj = importlib.import_module(module)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    return getattr(obj, "__wrapped__", obj)
+
+
+def _cache_lookup(cache: StageCache, entry: dict, func, args, kwargs):
+    if cache is None:
+        return None, False, None
+    key = stage_key(func, args, kwargs)
+    if key is None:
+        entry[PipeKey.CACHE.value] = CacheStatus.UNHASHABLE.value
+        return None, False, None
+    hit, value = cache.lookup(key)
+    entry[PipeKey.CACHE.value] = (CacheStatus.HIT if hit else CacheStatus.MISS).value
+    return key, hit, value
+
+
+def _evict(log: dict, max_entries: int = None):
+    # logs are filled in stage order so the oldest entry is always first, stages
+    # of one run on several threads can race to evict the same entry
+    if max_entries is None:
+        return
+    while len(log) > max_entries:
+        try:
+            log.pop(next(iter(log)), None)
+        except (RuntimeError, StopIteration):
+            pass
+
+
+def _check_dag(stages) -> dict:
+    # returns the stages that depend on each stage
+    names = [stage.__name__ for stage in stages]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        # results are returned by name
+        raise ValueError(f"Stages share the names {duplicates}")
+    dependents = {stage: [] for stage in stages}
+    for stage in stages:
+        if inspect.iscoroutinefunction(stage):
+            raise TypeError(f"Async stage `{stage.__name__}` can't run in a dag")
+        for dep in _dependencies(stage):
+            if dep not in dependents:
+                raise ValueError(
+                    f"`{stage.__name__}` depends on `{dep.__name__}` "
+                    "which isn't one of the stages"
+                )
+            dependents[dep].append(stage)
+
+    waiting = {stage: len(_dependencies(stage)) for stage in stages}
+    ready = [stage for stage in stages if not waiting[stage]]
+    visited = 0
+    while ready:
+        stage = ready.pop()
+        visited += 1
+        for dependent in dependents[stage]:
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+                ready.append(dependent)
+    if visited != len(stages):
+        raise ValueError("Stages have a dependency cycle")
+    return dependents
+
+
+def _memory_top_n(track_memory: Union[bool, int]) -> int:
+    # True only tracks the peak and net allocations, a number also lists that
+    # many of the allocation sites that changed most
+    return 0 if isinstance(track_memory, bool) else track_memory
+
+
+def _describe(value) -> dict:
+    if isinstance(value, tuple):
+        return {"type": "tuple", "items": [_summary(item) for item in value]}
+    if isinstance(value, dict):
+        return {"type": "dict", "items": {k: _summary(v) for k, v in value.items()}}
+    return _summary(value)
+
+
+def _summary(value) -> dict:
+    summary = {"type": type(value).__name__}
+    if isinstance(value, Sized):
+        # some sized types still refuse len(), like 0-d numpy arrays
+        try:
+            summary["len"] = len(value)
+        except Exception:
+            pass
+    return summary
+
+
+_END = object()
+
+
+def _prefetch(items, size: int):
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fill():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((_END, e))
+        else:
+            put((_END, None))
+
+    # the filler runs the upstream stages, so it logs into the consumer's run
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(fill,), daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _bind_run(run: PipeRun, items):
+    # the run is set around each step instead of across yields, the consumer may
+    # advance the stream from a different context each time
+    while True:
+        token = _current_run.set(run)
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        finally:
+            _current_run.reset(token)
+        yield item
+
+
+def _chunks(items, chunksize: int):
+    items = iter(items)
+    while chunk := list(islice(items, chunksize)):
+        yield chunk
+
+
+def _dependencies(stage) -> tuple:
+    return getattr(stage, "depends_on", ())
+
+
+def _run_in_process(stage, args):
+    run = PipeRun(None)
+    token = _current_run.set(run)
+    try:
+        return stage(*args), run.log, None
+    except Exception as e:
+        return None, run.log, e
+    finally:
+        _current_run.reset(token)
+
+
+def _run_chunk(stages, chunk, in_process: bool):
+    # every item is its own run, in a worker process the run's log is sent back
+    # to be registered in the parent, threads register with the parent directly
+    results = []
+    for item in chunk:
+        run = PipeRun(None) if in_process else Pipe._new_run()
+        token = _current_run.set(run)
+        try:
+            res, failed = Pipe.run(stages, item), False
+        except Exception as e:
+            res, failed = e, True
+        finally:
+            _current_run.reset(token)
+        results.append((res, run.log if in_process else None, failed))
+    return results
@@ -1,84 +1,267 @@
+import asyncio
 import inspect
-from collections import defaultdict
 from functools import wraps
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Sequence, Tuple
 
+from .fusion import fuse_validators, rule_cost
 from .validators import InvalidArgs
 
 
 # more simple decoupled implementation than the full Pipe class
-def validate_args(validations: dict = None, conversions: dict = None):
+def validate_args(
+    validations: dict = None, conversions: dict = None, max_failures: int = None
+):
+    # max_failures=None collects every failure, 1 fails on the first one
+    if max_failures is not None and max_failures < 1:
+        raise ValueError(f"`max_failures` must be at least 1. Got: {max_failures}.")
+    validations = validations or {}
+    conversions = conversions or {}
+
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            arg_dict = _create_arg_dict(inspect.getfullargspec(func), args, kwargs)
+        # everything that only depends on `func` and the rules is resolved once here
+        # so the per call work is limited to the arguments that actually have rules
+        arg_names, default_values = _compile_signature(inspect.getfullargspec(func))
+        arg_plan = _compile_plan(arg_names, validations, conversions, max_failures)
+        return_plan = _order_validations(validations.get("return", ()), max_failures)
+        sync_return_plan = tuple(
+            rule for rule in return_plan if not inspect.iscoroutinefunction(rule)
+        )
+        async_return_plan = tuple(
+            rule for rule in return_plan if inspect.iscoroutinefunction(rule)
+        )
+        return_accept = fuse_validators(sync_return_plan, "return")
+        has_async_rules = bool(async_return_plan) or any(
+            inspect.iscoroutinefunction(arg_step) for _, arg_step in arg_plan
+        )
+        if has_async_rules and not inspect.iscoroutinefunction(func):
+            raise TypeError(
+                f"`{func.__name__}` must be async to use async validators or converters"
+            )
+
+        def bind_args(args, kwargs):
+            arg_dict = {**default_values, **dict(zip(arg_names, args)), **kwargs}
+            fails = {}
+            remaining = max_failures
+            for arg_name, arg_step in arg_plan:
+                if arg_name not in arg_dict:
+                    continue
+                arg_dict[arg_name], arg_fails = arg_step(arg_dict[arg_name], remaining)
+                if arg_fails:
+                    fails[arg_name] = arg_fails
+                    if remaining is not None:
+                        remaining -= len(arg_fails)
+                        if not remaining:
+                            break
 
-            if conversions:
-                arg_dict = _convert_args(conversions, arg_dict)
+            if fails:
+                raise InvalidArgs(fails)
+            return arg_dict
 
-            if validations:
-                fails = _validate_args(
-                    validations,
-                    arg_dict,
+        async def abind_args(args, kwargs):
+            arg_dict = {**default_values, **dict(zip(arg_names, args)), **kwargs}
+            ruled = [step for step in arg_plan if step[0] in arg_dict]
+            results = await asyncio.gather(
+                *(
+                    _maybe_await(arg_step(arg_dict[arg_name], max_failures))
+                    for arg_name, arg_step in ruled
                 )
+            )
+            fails = {}
+            for (arg_name, _), (arg_value, arg_fails) in zip(ruled, results):
+                arg_dict[arg_name] = arg_value
+                if arg_fails:
+                    fails[arg_name] = arg_fails
 
-                if fails:
-                    invalid_args = InvalidArgs(dict(fails))
-                    raise invalid_args
+            if fails:
+                raise InvalidArgs(_trim_fails(fails, max_failures))
+            return arg_dict
 
-            res = func(**arg_dict)
+        def check_return(res):
+            if return_accept is None or return_accept(res):
+                return res
+            fails = _run_validations(sync_return_plan, "return", res, max_failures)
+            if fails:
+                raise InvalidArgs({"return": fails})
+            return res
 
-            if validations and validations.get("return", ()):
-                fails = _validate_arg(validations, "return", res)
+        async def acheck_return(res):
+            check_return(res)
+            fails = await _gather_validations(async_return_plan, "return", res)
+            if fails:
+                raise InvalidArgs(_trim_fails({"return": fails}, max_failures))
+            return res
 
-                if fails:
-                    invalid_args = InvalidArgs({"return": fails})
-                    raise invalid_args
+        if inspect.iscoroutinefunction(func) and (arg_plan or return_plan):
 
-            return res
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not arg_plan:
+                    res = await func(*args, **kwargs)
+                elif has_async_rules:
+                    res = await func(**(await abind_args(args, kwargs)))
+                else:
+                    res = await func(**bind_args(args, kwargs))
+                return await acheck_return(res) if return_plan else res
+
+        elif arg_plan and return_plan:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return check_return(func(**bind_args(args, kwargs)))
+
+        elif arg_plan:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return func(**bind_args(args, kwargs))
+
+        elif return_plan:
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return check_return(func(*args, **kwargs))
+
+        else:
+            return func
 
         return wrapper
 
     return decorator
 
 
-def _convert_args(conversions: Dict[str, List[Callable]], args_dict: dict):
-    for arg_name, arg_value in args_dict.items():
-        for conv in conversions.get(arg_name, ()):
+def _compile_signature(arg_spec: inspect.FullArgSpec) -> Tuple[List[str], dict]:
+    arg_names = arg_spec.args
+    defaults = arg_spec.defaults or ()
+
+    num_non_defaults = len(arg_names) - len(defaults)
+    default_values = dict(zip(arg_names[num_non_defaults:], defaults))
+    default_values.update(arg_spec.kwonlydefaults or {})
+    return arg_names, default_values
+
+
+def _compile_plan(
+    arg_names: Sequence[str],
+    validations: Dict[str, List[Callable]],
+    conversions: Dict[str, List[Callable]],
+    max_failures: int = None,
+) -> Tuple[Tuple[str, Callable], ...]:
+    ruled_names = [*validations, *conversions]
+    ordered_names = [name for name in arg_names if name in ruled_names]
+    ordered_names += [
+        name
+        for name in dict.fromkeys(ruled_names)
+        if name not in ordered_names and name != "return"
+    ]
+    plan = []
+    for name in ordered_names:
+        arg_conversions = tuple(conversions.get(name, ()))
+        arg_validations = _order_validations(validations.get(name, ()), max_failures)
+        if not arg_conversions and not arg_validations:
+            continue
+        if any(map(inspect.iscoroutinefunction, arg_conversions + arg_validations)):
+            plan.append(
+                (name, _compile_async_step(name, arg_conversions, arg_validations))
+            )
+        else:
+            plan.append((name, _compile_step(name, arg_conversions, arg_validations)))
+    return tuple(plan)
+
+
+def _compile_step(
+    arg_name: str,
+    arg_conversions: Sequence[Callable],
+    arg_validations: Sequence[Callable],
+) -> Callable[[Any], Tuple[Any, List[str]]]:
+    arg_conversions = tuple(arg_conversions)
+    accept = fuse_validators(arg_validations, arg_name)
+
+    def step(arg_value, limit=None):
+        for conv in arg_conversions:
             arg_value = conv(arg_name, arg_value)
-        args_dict[arg_name] = arg_value
-    return args_dict
+        if accept is None or accept(arg_value):
+            return arg_value, None
+        return arg_value, _run_validations(arg_validations, arg_name, arg_value, limit)
+
+    return step
+
+
+def _compile_async_step(
+    arg_name: str,
+    arg_conversions: Sequence[Callable],
+    arg_validations: Sequence[Callable],
+) -> Callable[[Any], Any]:
+    # async converters run in order, async validators are awaited concurrently
+    async_validations = tuple(
+        rule for rule in arg_validations if inspect.iscoroutinefunction(rule)
+    )
+    sync_step = _compile_step(
+        arg_name,
+        (),
+        tuple(rule for rule in arg_validations if rule not in async_validations),
+    )
+
+    async def step(arg_value, limit=None):
+        for conv in arg_conversions:
+            arg_value = await _maybe_await(conv(arg_name, arg_value))
+        arg_value, fails = sync_step(arg_value, limit)
+        fails = fails or []
+        if limit is None or len(fails) < limit:
+            fails += await _gather_validations(async_validations, arg_name, arg_value)
+        return arg_value, fails[:limit] or None
+
+    return step
+
+
+async def _maybe_await(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+async def _gather_validations(
+    arg_validations: Sequence[Callable], arg_name: str, arg_value: Any
+) -> list:
+    results = await asyncio.gather(
+        *(validation(arg_name, arg_value) for validation in arg_validations)
+    )
+    return [res for res in results if res is not None]
+
 
+def _trim_fails(fails: Dict[str, list], max_failures: int = None) -> Dict[str, list]:
+    if max_failures is None:
+        return fails
+    trimmed = {}
+    for arg_name, arg_fails in fails.items():
+        trimmed[arg_name] = arg_fails[:max_failures]
+        max_failures -= len(trimmed[arg_name])
+        if not max_failures:
+            break
+    return trimmed
 
-def _validate_arg(
-    validations: Dict[str, List[Callable]], arg_name: str, arg_value: Any
+
+def _order_validations(
+    arg_validations: Sequence[Callable], max_failures: int = None
+) -> tuple:
+    # when stopping early, the cheapest checks run first so rejects return sooner
+    if max_failures is None:
+        return tuple(arg_validations)
+    return tuple(sorted(arg_validations, key=rule_cost))
+
+
+def _run_validations(
+    arg_validations: Sequence[Callable],
+    arg_name: str,
+    arg_value: Any,
+    limit: int = None,
 ):
     fails = []
-    for validation in validations.get(arg_name, ()):
+    for validation in arg_validations:
         arg_validation = validation(arg_name, arg_value)
         if arg_validation is not None:
-            fails.append(repr(arg_validation))
-    return fails
-
-
-def _validate_args(validations: Dict[str, List[Callable]], args_dict: dict):
-    fails = defaultdict(list)
-    for arg_name, arg_value in args_dict.items():
-        arg_fails = _validate_arg(validations, arg_name, arg_value)
-        if arg_fails:
-            fails[arg_name] = arg_fails
+            fails.append(arg_validation)
+            if len(fails) == limit:
+                break
     return fails
 
 
 def _create_arg_dict(arg_spec: inspect.FullArgSpec, args, kwargs):
-    args = {i: arg for i, arg in enumerate(args)}
-    arg_names = arg_spec.args
-    defaults = arg_spec.defaults or ()
-
-    num_non_defaults = len(arg_names) - len(defaults)
-    default_values = dict(zip(arg_names[num_non_defaults:], defaults))
-    arg_dict = {
-        arg: args.get(i) or default_values.get(arg)
-        for i, arg in enumerate(arg_names[: max(num_non_defaults, len(args))])
-    }
-    return {**default_values, **arg_dict, **kwargs}
+    arg_names, default_values = _compile_signature(arg_spec)
+    return {**default_values, **dict(zip(arg_names, args)), **kwargs}
@@ -1,17 +1,76 @@
 import json
 import re
-from functools import wraps
-from typing import Any, Callable, Iterable
+from bisect import bisect_left
+from collections.abc import Collection, Mapping
+from collections.abc import Set as AbstractSet
+from functools import lru_cache, wraps
+from itertools import islice
+from typing import Any, Callable, Iterable, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# inline flags that can be scoped to one branch of a combined pattern
+_SCOPED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+_SCOPED_MASK = re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE
+
+# backreferences and conditionals refer to groups by number or name, which
+# change meaning once patterns are joined
+_GROUP_REFS = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
 
 
 class InvalidArgs(Exception):
-    def __init__(self, fails):
-        self.fails = fails
+    def __init__(self, failures):
+        # the failure objects, `fails` renders them as strings
+        self.failures = failures
+
+    @property
+    def fails(self):
+        return {
+            arg_name: [
+                fail if isinstance(fail, str) else repr(fail) for fail in arg_fails
+            ]
+            for arg_name, arg_fails in self.failures.items()
+        }
 
     def __str__(self):
         return json.dumps(self.fails, indent=4, sort_keys=False)
 
 
+class ValidationFailure(Exception):
+    # the message is only rendered when the failure is printed or logged, there
+    # are no __slots__ as exceptions keep a __dict__ regardless
+    error_type = Exception
+
+    def __init__(self, validator: Callable, arg_name: str, arg_value: Any):
+        self.validator = validator
+        self.arg_name = arg_name
+        self.arg_value = arg_value
+
+    @property
+    def args(self):
+        return (str(self),)
+
+    def __str__(self):
+        return self.validator.message(self.arg_name, self.arg_value)
+
+    def __repr__(self):
+        return f"{self.error_type.__name__}({str(self)!r})"
+
+    def __reduce__(self):
+        return self.error_type, (str(self),)
+
+
+class ValueFailure(ValidationFailure, ValueError):
+    error_type = ValueError
+
+
+class TypeFailure(ValidationFailure, TypeError):
+    error_type = TypeError
+
+
 def catch_type_error(func: Callable):
     @wraps(func)
     def wrapper(arg_name: str, arg_value: Any):
@@ -23,131 +82,358 @@ def catch_type_error(func: Callable):
     return wrapper
 
 
+def rule(op: str, param: Any = None, message: Callable = None):
+    def decorator(func: Callable):
+        func.op = op
+        func.param = param
+        func.message = message
+        return func
+
+    return decorator
+
+
 def is_type(arg_type: type):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must be type {arg_type}. Got: {type(arg_value)}"
+
+    @rule("is_type", arg_type, message)
     def wrapper(arg_name: str, arg_value: Any):
         if not isinstance(arg_value, arg_type):
-            return TypeError(
-                f"`{arg_name}` must be type {arg_type}. Got: {type(arg_value)}"
-            )
+            return TypeFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def eq(value: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must equal {value}. Got: {arg_value}."
+
+    @rule("eq", value, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not arg_value == value:
-            return ValueError(f"`{arg_name}` must equal {value}. Got: {arg_value}.")
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def gt(limit: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must be greater than {limit}. Got: {arg_value}."
+
+    @rule("gt", limit, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not arg_value > limit:
-            return ValueError(
-                f"`{arg_name}` must be greater than {limit}. Got: {arg_value}."
-            )
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def lt(limit: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must be less than {limit}. Got: {arg_value}."
+
+    @rule("lt", limit, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not arg_value < limit:
-            return ValueError(
-                f"`{arg_name}` must be less than {limit}. Got: {arg_value}."
-            )
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def ge(limit: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return (
+            f"`{arg_name}` must be greater than or equal to {limit}. Got: {arg_value}."
+        )
+
+    @rule("ge", limit, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not arg_value >= limit:
-            return ValueError(
-                f"`{arg_name}` must be greater than or equal to {limit}. Got: {arg_value}."
-            )
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def le(limit: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must be less than or equal to {limit}. Got: {arg_value}."
+
+    @rule("le", limit, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not arg_value <= limit:
-            return ValueError(
-                f"`{arg_name}` must be less than or equal to {limit}. Got: {arg_value}."
-            )
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def max_len(limit: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must have a length less than or equal to {limit}. Got length: {len(arg_value)}."
+
+    @rule("max_len", limit, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not len(arg_value) <= limit:
-            return ValueError(
-                f"`{arg_name}` must have a length less than or equal to {limit}. Got length: {len(arg_value)}."
-            )
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def min_len(limit: int):
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must have a length greater than or equal to {limit}. Got length: {len(arg_value)}."
+
+    @rule("min_len", limit, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
         if not len(arg_value) >= limit:
-            return ValueError(
-                f"`{arg_name}` must have a length greater than or equal to {limit}. Got length: {len(arg_value)}."
-            )
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
-def re_match(pattern: str):
+def re_match(pattern: Union[str, re.Pattern], flags: int = 0):
+    compiled = _compile(pattern, flags)
+
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must match the regex pattern `{compiled.pattern}`. Got: {arg_value}."
+
+    @rule("re_match", compiled, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
-        if not re.fullmatch(pattern, arg_value):
-            return ValueError(
-                f"`{arg_name}` must match the regex pattern `{pattern}`. Got: {arg_value}."
-            )
+        if not compiled.fullmatch(arg_value):
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
-def re_search(pattern: str):
+def re_search(pattern: Union[str, re.Pattern], flags: int = 0):
+    compiled = _compile(pattern, flags)
+
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must contain a match for the regex pattern `{compiled.pattern}`. Got: {arg_value}."
+
+    @rule("re_search", compiled, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
-        if not re.search(pattern, arg_value):
-            return ValueError(
-                f"`{arg_name}` must contain a match for the regex pattern `{pattern}`. Got: {arg_value}."
-            )
+        if not compiled.search(arg_value):
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
+def re_match_any(patterns: Iterable[Union[str, re.Pattern]], flags: int = 0):
+    patterns = tuple(patterns)
+    compiled = _compile_any(patterns, flags)
+    pattern_strs = [_pattern_str(pattern) for pattern in patterns]
+
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must match one of the regex patterns {pattern_strs}. Got: {arg_value}."
+
+    if isinstance(compiled, re.Pattern):
+
+        @rule("re_match", compiled, message)
+        @catch_type_error
+        def wrapper(arg_name: str, arg_value: Any):
+            if not compiled.fullmatch(arg_value):
+                return ValueFailure(wrapper, arg_name, arg_value)
+
+    else:
+
+        @rule("re_match", compiled, message)
+        @catch_type_error
+        def wrapper(arg_name: str, arg_value: Any):
+            if not any(pattern.fullmatch(arg_value) for pattern in compiled):
+                return ValueFailure(wrapper, arg_name, arg_value)
+
+    return wrapper
+
+
+def re_search_any(patterns: Iterable[Union[str, re.Pattern]], flags: int = 0):
+    patterns = tuple(patterns)
+    compiled = _compile_any(patterns, flags)
+    pattern_strs = [_pattern_str(pattern) for pattern in patterns]
+
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must contain a match for one of the regex patterns {pattern_strs}. Got: {arg_value}."
+
+    if isinstance(compiled, re.Pattern):
+
+        @rule("re_search", compiled, message)
+        @catch_type_error
+        def wrapper(arg_name: str, arg_value: Any):
+            if not compiled.search(arg_value):
+                return ValueFailure(wrapper, arg_name, arg_value)
+
+    else:
+
+        @rule("re_search", compiled, message)
+        @catch_type_error
+        def wrapper(arg_name: str, arg_value: Any):
+            if not any(pattern.search(arg_value) for pattern in compiled):
+                return ValueFailure(wrapper, arg_name, arg_value)
+
+    return wrapper
+
+
+@lru_cache(maxsize=4096)
+def _compile(pattern: Union[str, re.Pattern], flags: int = 0) -> re.Pattern:
+    if isinstance(pattern, re.Pattern) and not flags:
+        return pattern
+    return re.compile(pattern, flags)
+
+
+def _compile_any(
+    patterns: Sequence[Union[str, re.Pattern]], flags: int = 0
+) -> Union[re.Pattern, Tuple[re.Pattern, ...]]:
+    # one alternation is faster than trying each pattern, but only keeps their
+    # meaning when they share global flags like re.ASCII and don't refer to
+    # their own groups, otherwise the patterns are compiled separately
+    separate = tuple(
+        pattern if isinstance(pattern, re.Pattern) else _compile(pattern, flags)
+        for pattern in patterns
+    )
+    global_flags = _compile("", flags).flags & ~_SCOPED_MASK
+    if all(
+        pattern.flags & ~_SCOPED_MASK == global_flags
+        and not pattern.groupindex
+        and not _GROUP_REFS.search(pattern.pattern)
+        for pattern in separate
+    ):
+        try:
+            return _compile(_alternation(patterns), flags)
+        except re.error:
+            pass
+    return separate
+
+
+def _alternation(patterns: Iterable[Union[str, re.Pattern]]) -> str:
+    branches = []
+    for pattern in patterns:
+        if isinstance(pattern, re.Pattern):
+            scoped = "".join(
+                letter for flag, letter in _SCOPED_FLAGS.items() if pattern.flags & flag
+            )
+            branches.append(f"(?{scoped}:{pattern.pattern})")
+        else:
+            branches.append(f"(?:{pattern})")
+    return "|".join(branches)
+
+
+def _pattern_str(pattern: Union[str, re.Pattern]) -> str:
+    return pattern.pattern if isinstance(pattern, re.Pattern) else pattern
+
+
+class SortedAllowlist:
+    # membership via binary search, for allowlists too large to hold as a set
+    __slots__ = ("values",)
+
+    def __init__(self, values: Sequence, presorted: bool = False):
+        self.values = values if presorted else sorted(values)
+
+    @classmethod
+    def from_file(cls, path: str, presorted: bool = False):
+        with open(path) as f:
+            values = [line.rstrip("\r\n") for line in f]
+        return cls([value for value in values if value], presorted)
+
+    @classmethod
+    def from_npy(cls, path: str, mmap: bool = True):
+        # the array must already be sorted, it is searched in place
+        if np is None:
+            raise ImportError("numpy is required to load `.npy` allowlists")
+        return cls(np.load(path, mmap_mode="r" if mmap else None), presorted=True)
+
+    def __contains__(self, value: Any) -> bool:
+        if np is not None and isinstance(self.values, np.ndarray):
+            i = int(np.searchsorted(self.values, value))
+        else:
+            i = bisect_left(self.values, value)
+        return i < len(self.values) and bool(self.values[i] == value)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({_preview(self.values)})"
+
+
 def is_in(valid_values: Iterable):
+    if not isinstance(valid_values, Collection):
+        valid_values = tuple(valid_values)
+    members = _freeze(valid_values)
+    preview = _preview(valid_values)
+
+    def message(arg_name: str, arg_value: Any) -> str:
+        return f"`{arg_name}` must be one of {preview}. Got: {arg_value}."
+
+    @rule("is_in", members, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Any):
-        if arg_value not in valid_values:
-            return ValueError(
-                f"`{arg_name}` must be one of {valid_values}. Got: {arg_value}."
-            )
+        try:
+            found = arg_value in members
+        except TypeError:
+            found = False
+        if not found:
+            return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
 
 
 def contains(required_values: Iterable):
+    if not isinstance(required_values, Collection):
+        required_values = tuple(required_values)
+    required = tuple(required_values)
+    preview = _preview(required_values)
+    try:
+        use_set = len(frozenset(required)) > 1
+    except TypeError:
+        use_set = False
+
+    def message(arg_name: str, arg_value: Iterable) -> str:
+        missing = [val for val in required if val not in arg_value]
+        return f"`{arg_name}` must contain all of {preview}. Missing: {missing}."
+
+    @rule("contains", required, message)
     @catch_type_error
     def wrapper(arg_name: str, arg_value: Iterable):
-        missing = [val for val in required_values if val not in arg_value]
-        if missing:
-            return ValueError(
-                f"`{arg_name}` must contain all of {required_values}. Missing: {missing}."
-            )
+        members = arg_value
+        if use_set and not isinstance(arg_value, (str, bytes, AbstractSet, Mapping)):
+            try:
+                members = frozenset(arg_value)
+            except TypeError:
+                pass
+        for val in required:
+            if val not in members:
+                return ValueFailure(wrapper, arg_name, arg_value)
 
     return wrapper
+
+
+def _freeze(valid_values: Collection) -> Collection:
+    # strings are kept so `is_in("abc")` still accepts substrings like "ab"
+    # rather than only single characters, ranges, sets and mappings already
+    # have fast lookups and a range may be far too big to copy
+    if isinstance(
+        valid_values, (str, bytes, range, AbstractSet, Mapping, SortedAllowlist)
+    ):
+        return valid_values
+    try:
+        return frozenset(valid_values)
+    except TypeError:
+        return tuple(valid_values)
+
+
+def _preview(values: Collection, limit: int = 10) -> str:
+    if len(values) <= limit:
+        return str(values)
+    head = ", ".join(repr(value) for value in islice(values, limit))
+    return f"[{head}, ...] ({len(values)} values)"
@@ -0,0 +1,225 @@
+from contextlib import nullcontext as does_not_raise
+
+import pytest
+
+import src.useful_decorators.pipeline.batch as batch
+import src.useful_decorators.pipeline.converters as con
+import src.useful_decorators.pipeline.validators as val
+
+
+@pytest.fixture(params=("python", "numpy"))
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(batch, "np", None)
+    else:
+        pytest.importorskip("numpy")
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "validators, values, expected_index, expected_context",
+    (
+        pytest.param(
+            [val.gt(0)],
+            [1, 0, 3, -1],
+            [1, 3],
+            does_not_raise(),
+            id="Ensure flags values failing a comparison",
+        ),
+        pytest.param(
+            [val.ge(0), val.le(2)],
+            [1, -1, 3, 2],
+            [1, 2],
+            does_not_raise(),
+            id="Ensure combines failures across validators",
+        ),
+        pytest.param(
+            [val.is_in(("a", "b"))],
+            ["a", "c", "b"],
+            [1],
+            does_not_raise(),
+            id="Ensure flags values not in valid values",
+        ),
+        pytest.param(
+            [val.is_in(val.SortedAllowlist(["b", "a"]))],
+            ["a", "c", "b", "0"],
+            [1, 3],
+            does_not_raise(),
+            id="Ensure flags values not in a sorted allowlist",
+        ),
+        pytest.param(
+            [val.max_len(2)],
+            ["ab", "abc", ""],
+            [1],
+            does_not_raise(),
+            id="Ensure flags values that are too long",
+        ),
+        pytest.param(
+            [val.re_match("[0-9]+")],
+            ["12", "1a", "3"],
+            [1],
+            does_not_raise(),
+            id="Ensure flags values not matching the pattern",
+        ),
+        pytest.param(
+            [val.gt(0)],
+            [1, "1", 2],
+            [1],
+            does_not_raise(),
+            id="Ensure flags values of the wrong type",
+        ),
+        pytest.param(
+            [val.is_in(("1",))],
+            [1, "1"],
+            [0],
+            does_not_raise(),
+            id="Ensure mixed types aren't coerced for membership",
+        ),
+        pytest.param(
+            [val.is_in([1, "x"])],
+            ["1", "x", "y"],
+            [0, 2],
+            does_not_raise(),
+            id="Ensure a mixed allowlist isn't coerced to strings",
+        ),
+        pytest.param(
+            [val.is_in([1, "x"])],
+            [1, 2],
+            [1],
+            does_not_raise(),
+            id="Ensure a mixed allowlist matches values of its own type",
+        ),
+        pytest.param(
+            [val.is_in("abc")],
+            ["ab", "ac", "c"],
+            [1],
+            does_not_raise(),
+            id="Ensure a string allowlist matches substrings",
+        ),
+        pytest.param(
+            [val.eq("1")],
+            [1, "1"],
+            [0],
+            does_not_raise(),
+            id="Ensure mixed types aren't coerced for comparisons",
+        ),
+        pytest.param(
+            [val.max_len(2)],
+            [1234, "ab"],
+            [0],
+            does_not_raise(),
+            id="Ensure mixed types aren't coerced for lengths",
+        ),
+        pytest.param(
+            [lambda arg_name, arg_value: None if arg_value else ValueError()],
+            [1, 0, 1],
+            [1],
+            does_not_raise(),
+            id="Ensure falls back to calling untagged validators",
+        ),
+    ),
+)
+def test_validate_batch(backend, validators, values, expected_index, expected_context):
+    with expected_context:
+        res = batch.validate_batch(validators, values, "a")
+        assert list(res.index) == expected_index
+        assert res.ok == (not expected_index)
+
+
+def test_validate_batch_messages_only_for_failures(backend):
+    res = batch.validate_batch([val.ge(0), val.le(2)], [1, -1, 3], "a")
+    messages = list(res.messages())
+    assert [i for i, _ in messages] == [1, 2]
+    assert all(len(fails) == 1 for _, fails in messages)
+    assert "greater than or equal to 0" in messages[0][1][0]
+    assert len(list(res.messages(limit=1))) == 1
+
+
+def test_validate_columns(backend):
+    res = batch.validate_columns(
+        {"a": [val.gt(0)], "b": [val.is_type(str)]},
+        {"a": [1, 0], "b": ["x", 1], "c": [None, None]},
+    )
+    assert set(res) == {"a", "b"}
+    assert list(res["a"].index) == [1]
+    assert list(res["b"].index) == [1]
+
+
+@pytest.mark.parametrize(
+    "converters, values, expected_result, expected_error_index, expected_context",
+    (
+        pytest.param(
+            [con.clip_min(0), con.clip_max(2)],
+            [-1, 1, 3],
+            [0, 1, 2],
+            [],
+            does_not_raise(),
+            id="Ensure clips values into range",
+        ),
+        pytest.param(
+            [con.strip_chars(" "), con.to_upper()],
+            [" a ", "b "],
+            ["A", "B"],
+            [],
+            does_not_raise(),
+            id="Ensure applies string conversions in order",
+        ),
+        pytest.param(
+            [con.replace_none(0), con.to_type(int)],
+            [None, "2", 3.0],
+            [0, 2, 3],
+            [],
+            does_not_raise(),
+            id="Ensure replaces None before converting type",
+        ),
+        pytest.param(
+            [con.to_type(int)],
+            ["1", "x", 2],
+            [1, "x", 2],
+            [1],
+            does_not_raise(),
+            id="Ensure collects errors and keeps the original value",
+        ),
+    ),
+)
+def test_convert_batch(
+    backend,
+    converters,
+    values,
+    expected_result,
+    expected_error_index,
+    expected_context,
+):
+    with expected_context:
+        res, errors = batch.convert_batch(converters, values, "a")
+        assert list(res) == expected_result
+        assert [err.index for err in errors] == expected_error_index
+
+
+def test_convert_batch_does_not_print(capsys):
+    batch.convert_batch(con.clip_min(0), [None, 1], "a")
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize(
+    "converters, values",
+    (
+        pytest.param(con.to_type(str), [1, 2], id="Ensure converted in numpy"),
+        pytest.param(con.to_type(str), [1, 2.0], id="Ensure converted in python"),
+        pytest.param((), [1, 2], id="Ensure without converters"),
+    ),
+)
+def test_convert_batch_keeps_container(backend, converters, values):
+    res, _ = batch.convert_batch(converters, values)
+    assert type(res) is list
+    if backend == "numpy":
+        for dtype in (None, object):
+            arr = batch.np.array(values, dtype=dtype)
+            res, _ = batch.convert_batch(converters, arr)
+            assert isinstance(res, batch.np.ndarray)
+
+
+def test_convert_batch_clips_nan_like_scalar(backend):
+    nan = float("nan")
+    res, _ = batch.convert_batch((con.clip_min(0), con.clip_max(2)), [nan, 3.0])
+    assert list(res) == [0, 2]
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.useful_decorators.pipeline.batching import MicroBatcher
+from src.useful_decorators.pipeline.constants import ActionOnFail, PipeKey
+from src.useful_decorators.pipeline.pipe import Pipe
+
+
+def _recording_square():
+    batches = []
+
+    def square(items):
+        batches.append(list(items))
+        return [n * n for n in items]
+
+    return square, batches
+
+
+def test_micro_batcher_batches_concurrent_callers():
+    square, batches = _recording_square()
+    batcher = MicroBatcher(square, max_size=8, max_wait=0.05)
+    results = {}
+
+    def call(n):
+        results[n] = batcher(n)
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {n: n * n for n in range(20)}
+    assert len(batches) < 20
+    assert all(len(batch) <= 8 for batch in batches)
+
+
+def test_micro_batcher_async():
+    square, batches = _recording_square()
+    batcher = MicroBatcher(square, max_size=4, max_wait=0.05)
+
+    async def main():
+        return await asyncio.gather(*(batcher.acall(n) for n in range(10)))
+
+    assert asyncio.run(main()) == [n * n for n in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    batcher.close()
+
+
+def test_micro_batcher_flushes_after_max_wait():
+    square, batches = _recording_square()
+    batcher = MicroBatcher(square, max_size=100, max_wait=0.01)
+    start = time.perf_counter()
+    assert batcher(3) == 9
+    assert time.perf_counter() - start < 0.5
+    assert batches == [[3]]
+    batcher.close()
+
+
+def test_micro_batcher_small_queue():
+    square, _ = _recording_square()
+    batcher = MicroBatcher(square, max_size=2, max_wait=0.001, max_queue=1)
+    futures = [batcher.submit(n) for n in range(10)]
+    assert [future.result() for future in futures] == [n * n for n in range(10)]
+    batcher.close()
+
+
+@pytest.mark.parametrize(
+    "func, expected_error",
+    (
+        pytest.param(lambda items: items[:1], ValueError, id="Ensure checks lengths"),
+        pytest.param(lambda items: 1 / 0, ZeroDivisionError, id="Ensure propagates"),
+    ),
+)
+def test_micro_batcher_errors(func, expected_error):
+    batcher = MicroBatcher(func, max_wait=0.01)
+    futures = [batcher.submit(n) for n in range(3)]
+    for future in futures:
+        with pytest.raises(expected_error):
+            future.result()
+    batcher.close()
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        pytest.param({"max_size": 0}, id="Ensure max_size >= 1"),
+        pytest.param({"max_wait": -1}, id="Ensure max_wait >= 0"),
+        pytest.param({"max_queue": 0}, id="Ensure max_queue >= 1"),
+    ),
+)
+def test_micro_batcher_rejects_invalid(kwargs):
+    with pytest.raises(ValueError):
+        MicroBatcher(sum, **kwargs)
+
+
+def test_pipe_batch_stage():
+    @Pipe.batch_stage(max_size=16, max_wait=0.02)
+    def double_all(items):
+        return [n * 2 for n in items]
+
+    @Pipe.stage()
+    def inc(n):
+        return n + 1
+
+    assert double_all.__name__ == "double_all"
+    res = Pipe.run_many((inc, double_all), range(10), max_workers=10)
+    assert res == [(n + 1) * 2 for n in range(10)]
+    double_all.close()
+
+    entries = [
+        entry
+        for entry in Pipe.log.values()
+        if entry[PipeKey.FUNC.value] == "double_all"
+    ]
+    assert sum(len(entry[PipeKey.ARGS.value][0]) for entry in entries) == 10
+
+
+def test_pipe_batch_stage_continue_on_fail():
+    @Pipe.batch_stage(action_on_fail=ActionOnFail.CONTINUE.value, max_wait=0.001)
+    def fails(items):
+        raise ValueError("bad batch")
+
+    assert fails(1) is None
+    fails.close()
+
+
+def test_pipe_batch_stage_rejects_async():
+    with pytest.raises(TypeError):
+
+        @Pipe.batch_stage()
+        async def predict(items):
+            return items
@@ -0,0 +1,174 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from src.useful_decorators.pipeline.cache import (
+    DiskCache,
+    MemoryCache,
+    StageCache,
+    stage_key,
+)
+
+
+def _double(n):
+    return n * 2
+
+
+def _triple(n):
+    return n * 3
+
+
+def _scaler(factor):
+    def scale(n):
+        return n * factor
+
+    return scale
+
+
+def _with_default(offset):
+    def shift(n, offset=offset):
+        return n + offset
+
+    return shift
+
+
+def _with_helper(factor):
+    def helper(n):
+        return n * factor
+
+    def apply(n):
+        return helper(n)
+
+    return apply
+
+
+@pytest.mark.parametrize(
+    "args_a, kwargs_a, args_b, kwargs_b, same",
+    (
+        pytest.param((1,), {}, (1,), {}, True, id="Ensure equal inputs share a key"),
+        pytest.param((1,), {}, (2,), {}, False, id="Ensure args change the key"),
+        pytest.param(
+            (),
+            {"a": 1, "b": 2},
+            (),
+            {"b": 2, "a": 1},
+            True,
+            id="Ensure kwargs order is ignored",
+        ),
+        pytest.param(
+            ({"x", "y", "z"},),
+            {},
+            ({"z", "y", "x"},),
+            {},
+            True,
+            id="Ensure sets hash independent of order",
+        ),
+        pytest.param(([1],), {}, ((1,),), {}, False, id="Ensure list != tuple"),
+    ),
+)
+def test_stage_key_inputs(args_a, kwargs_a, args_b, kwargs_b, same):
+    key_a = stage_key(_double, args_a, kwargs_a)
+    key_b = stage_key(_double, args_b, kwargs_b)
+    assert (key_a == key_b) is same
+
+
+def test_stage_key_depends_on_function():
+    assert stage_key(_double, (1,), {}) != stage_key(_triple, (1,), {})
+
+
+@pytest.mark.parametrize(
+    "make",
+    (
+        pytest.param(_scaler, id="Ensure closure values change the key"),
+        pytest.param(_with_default, id="Ensure defaults change the key"),
+        pytest.param(_with_helper, id="Ensure nested helpers' closures change the key"),
+    ),
+)
+def test_stage_key_depends_on_factory_values(make):
+    assert stage_key(make(2), (3,), {}) != stage_key(make(10), (3,), {})
+    assert stage_key(make(2), (3,), {}) == stage_key(make(2), (3,), {})
+
+
+def test_stage_key_unpicklable_closure():
+    lock = threading.Lock()
+
+    def locked(n):
+        with lock:
+            return n
+
+    assert stage_key(locked, (1,), {}) is None
+
+
+def test_stage_key_ignores_later_changes_to_closure_contents():
+    calls = []
+
+    def counted(n):
+        calls.append(n)
+        return n
+
+    key = stage_key(counted, (1,), {})
+    counted(1)
+    assert stage_key(counted, (1,), {}) == key
+
+
+def test_stage_key_unpicklable_input():
+    assert stage_key(_double, (lambda: None,), {}) is None
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(max_size=2)
+    cache.store("a", 1)
+    cache.store("b", 2)
+    assert cache.lookup("a") == (True, 1)
+    cache.store("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, 1)
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+@pytest.mark.parametrize("backend", ("memory", "disk"))
+def test_cache_ttl(backend, tmp_path):
+    cache = MemoryCache(ttl=0.05) if backend == "memory" else DiskCache(tmp_path, 0.05)
+    cache.store("key", [1, 2])
+    assert cache.lookup("key") == (True, [1, 2])
+    time.sleep(0.06)
+    assert cache.lookup("key") == (False, None)
+
+
+def test_disk_cache_shared_between_instances(tmp_path):
+    DiskCache(tmp_path).store("ab12", {"rows": 3})
+    cache = DiskCache(tmp_path)
+    assert cache.lookup("ab12") == (True, {"rows": 3})
+    cache.clear()
+    assert cache.lookup("ab12") == (False, None)
+
+
+class _Moved:
+    pass
+
+
+def test_disk_cache_stale_entry_is_a_miss(monkeypatch, tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.store("ab12", _Moved())
+    monkeypatch.delattr(sys.modules[__name__], "_Moved")
+    assert cache.lookup("ab12") == (False, None)
+
+
+def test_stage_cache_is_abstract():
+    with pytest.raises(TypeError):
+        StageCache()
+
+
+@pytest.mark.parametrize(
+    "kwargs, expectation",
+    (
+        pytest.param({"max_size": 0}, pytest.raises(ValueError), id="Ensure size >= 1"),
+        pytest.param({"ttl": 0}, pytest.raises(ValueError), id="Ensure ttl > 0"),
+    ),
+)
+def test_memory_cache_rejects_invalid(kwargs, expectation):
+    with expectation:
+        MemoryCache(**kwargs)
@@ -0,0 +1,68 @@
+import pytest
+
+from src.useful_decorators.pipeline.checkpoint import (
+    CheckpointStore,
+    load_checkpoint,
+    save_checkpoint,
+)
+
+
+@pytest.mark.parametrize(
+    "value",
+    (
+        pytest.param([1, 2, 3], id="Ensure pickles lists"),
+        pytest.param({"a": (1, None)}, id="Ensure pickles dicts"),
+        pytest.param(None, id="Ensure pickles None"),
+    ),
+)
+def test_checkpoint_round_trip(value, tmp_path):
+    path = save_checkpoint(str(tmp_path / "000_stage"), value)
+    assert path.endswith(".pkl")
+    assert load_checkpoint(path) == value
+
+
+def test_checkpoint_numpy_is_memory_mapped(tmp_path):
+    np = pytest.importorskip("numpy")
+    arr = np.arange(10, dtype=np.int64)
+    path = save_checkpoint(str(tmp_path / "000_stage"), arr)
+    assert path.endswith(".npy")
+
+    loaded = load_checkpoint(path)
+    assert isinstance(loaded, np.memmap)
+    loaded[0] = 100
+    assert load_checkpoint(path)[0] == 0
+
+
+def test_checkpoint_arrow_round_trip(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table({"a": [1, 2, 3]})
+    path = save_checkpoint(str(tmp_path / "000_stage"), table)
+    assert path.endswith(".arrow")
+    assert load_checkpoint(path).equals(table)
+
+
+def test_checkpoint_store_resume(tmp_path):
+    store = CheckpointStore(tmp_path, ["load", "clean", "score"])
+    store.save(0, [1, 2])
+    store.save(1, [2, 4])
+
+    assert CheckpointStore(tmp_path, ["load", "clean", "score"]).resume(None) == (
+        2,
+        [2, 4],
+    )
+    assert CheckpointStore(tmp_path, ["load", "tidy", "score"]).resume("x") == (
+        1,
+        [1, 2],
+    )
+    assert CheckpointStore(tmp_path, ["parse"]).resume("x") == (0, "x")
+
+
+def test_checkpoint_store_overwrites_later_stages(tmp_path):
+    store = CheckpointStore(tmp_path, ["load", "clean"])
+    store.save(0, 1)
+    store.save(1, 2)
+    store.save(0, 3)
+    assert store.completed == ["000_load.pkl"]
+    assert not (tmp_path / "001_clean.pkl").exists()
+    store.reset()
+    assert CheckpointStore(tmp_path, ["load", "clean"]).resume("x") == (0, "x")
@@ -0,0 +1,46 @@
+from collections.abc import Sized
+
+import pytest
+
+import src.useful_decorators.pipeline.validators as val
+from src.useful_decorators.pipeline.fusion import fuse_validators
+
+VALUES = (-1, 0, 1, 2, 3, 1.5, "1", "", "ab", "abc", "abcd", None, (1, 2), [1])
+
+
+@pytest.mark.parametrize(
+    "validators",
+    (
+        pytest.param([val.ge(0), val.le(2)], id="Ensure fuses ge and le"),
+        pytest.param([val.gt(0), val.lt(2)], id="Ensure fuses gt and lt"),
+        pytest.param([val.ge(0), val.lt(2)], id="Ensure fuses ge and lt"),
+        pytest.param([val.gt(0), val.le(2)], id="Ensure fuses gt and le"),
+        pytest.param([val.gt(0), val.ge(1), val.le(2)], id="Ensure keeps extra bounds"),
+        pytest.param([val.min_len(1), val.max_len(3)], id="Ensure fuses len bounds"),
+        pytest.param([val.max_len(2)], id="Ensure handles a single len bound"),
+        pytest.param(
+            [val.is_type(int), val.is_type(float)], id="Ensure types all apply"
+        ),
+        pytest.param(
+            [val.is_type((int, float)), val.is_type(int)], id="Ensure handles tuples"
+        ),
+        pytest.param([val.is_type(Sized), val.is_type(str)], id="Ensure handles ABCs"),
+        pytest.param(
+            [val.is_type(str), val.re_match("[a-c]+"), val.is_in(("ab", "abc"))],
+            id="Ensure mixes fused and unfused validators",
+        ),
+        pytest.param(
+            [lambda arg_name, arg_value: None if arg_value else ValueError()],
+            id="Ensure handles untagged validators",
+        ),
+    ),
+)
+def test_fuse_validators_matches_validators(validators):
+    accept = fuse_validators(validators, "a")
+    for value in VALUES:
+        expected = all(validator("a", value) is None for validator in validators)
+        assert accept(value) is expected, value
+
+
+def test_fuse_validators_without_validators():
+    assert fuse_validators([], "a") is None
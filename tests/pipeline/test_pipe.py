@@ -1,5 +1,18 @@
+import asyncio
 import math
+import threading
+import time
+from contextlib import nullcontext as does_not_raise
 
+import pytest
+
+from src.useful_decorators.decorators import RetryPolicy
+from src.useful_decorators.pipeline.cache import DiskCache, MemoryCache
+from src.useful_decorators.pipeline.constants import (
+    ActionOnFail,
+    CacheStatus,
+    PipeKey,
+)
 from src.useful_decorators.pipeline.pipe import Pipe
 
 
@@ -25,3 +38,812 @@ def test_pipe():
         return max(*numbers)
 
     assert Pipe.run((get_primes, sum_indexes, larger_item), range(100)) == 556
+
+
+def test_pipe_async():
+    @Pipe.stage()
+    async def double(numbers):
+        await asyncio.sleep(0)
+        return [n * 2 for n in numbers]
+
+    @Pipe.stage()
+    def total(numbers):
+        return sum(numbers)
+
+    with Pipe.run_context() as run:
+        assert asyncio.run(Pipe.arun((double, total), [1, 2, 3])) == 12
+    assert run.log[0][PipeKey.RETURN.value] == [2, 4, 6]
+
+
+def test_pipe_stage_continue_on_fail():
+    @Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value)
+    def fails(data):
+        raise ValueError("bad data")
+
+    assert fails(1) is None
+    exceptions = Pipe.log[Pipe.stage_count - 1][PipeKey.EXCEPTIONS.value]
+    assert isinstance(exceptions[0], ValueError)
+
+
+@Pipe.stage()
+def _square(n):
+    return n * n
+
+
+@Pipe.stage()
+def _check_positive(n):
+    if n < 0:
+        raise ValueError(f"{n} is negative")
+    return n
+
+
+@Pipe.stage()
+def _load(n):
+    return list(range(n))
+
+
+@Pipe.stage(depends_on=[_load])
+def _total(numbers):
+    time.sleep(0.02)
+    return sum(numbers)
+
+
+@Pipe.stage(depends_on=[_load])
+def _count(numbers):
+    time.sleep(0.02)
+    return len(numbers)
+
+
+@Pipe.stage(depends_on=[_total, _count])
+def _mean(total, count):
+    return total / count
+
+
+@Pipe.stage(depends_on=[_load])
+def _fail(numbers):
+    raise ValueError("bad numbers")
+
+
+@Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value, depends_on=[_load])
+def _fail_and_continue(numbers):
+    raise ValueError("bad numbers")
+
+
+@Pipe.stage(depends_on=[_fail_and_continue])
+def _after_fail(res):
+    return res
+
+
+# the process timeout backend imports stages in the child, so they're module level
+def _sleep(n):
+    time.sleep(n)
+    return n
+
+
+def _raise_key_error(n):
+    raise KeyError(n)
+
+
+def _append(items):
+    items.append(1)
+    return len(items)
+
+
+@pytest.mark.parametrize("executor", ("thread", "process"))
+def test_pipe_run_dag(executor):
+    with Pipe.run_context() as run:
+        res = Pipe.run_dag(
+            (_load, _total, _count, _mean), 5, executor=executor, max_workers=2
+        )
+    assert res == {"_load": [0, 1, 2, 3, 4], "_total": 10, "_count": 5, "_mean": 2.0}
+    assert sorted(entry[PipeKey.FUNC.value] for entry in run.log.values()) == [
+        "_count",
+        "_load",
+        "_mean",
+        "_total",
+    ]
+
+
+def test_pipe_run_dag_runs_branches_concurrently():
+    # each branch waits for the other, so running them one after the other
+    # breaks the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    @Pipe.stage(depends_on=[_load])
+    def left(numbers):
+        barrier.wait()
+        return sum(numbers)
+
+    @Pipe.stage(depends_on=[_load])
+    def right(numbers):
+        barrier.wait()
+        return len(numbers)
+
+    res = Pipe.run_dag((_load, left, right), 5, max_workers=2)
+    assert (res["left"], res["right"]) == (10, 5)
+
+
+def test_pipe_run_dag_rejects_duplicate_names():
+    def make():
+        @Pipe.stage(depends_on=[_load])
+        def branch(numbers):
+            return numbers
+
+        return branch
+
+    with pytest.raises(ValueError):
+        Pipe.run_dag((_load, make(), make()), 5)
+
+
+@pytest.mark.parametrize(
+    "stages, expectation",
+    (
+        pytest.param(
+            (_load, _fail, _mean),
+            pytest.raises(ValueError),
+            id="Ensure rejects missing dependencies",
+        ),
+        pytest.param(
+            (_load, _fail), pytest.raises(ValueError), id="Ensure breaks on fail"
+        ),
+        pytest.param(
+            (_load, _fail_and_continue, _after_fail),
+            does_not_raise(),
+            id="Ensure continues on fail",
+        ),
+    ),
+)
+@pytest.mark.parametrize("executor", ("thread", "process"))
+def test_pipe_run_dag_action_on_fail(stages, expectation, executor):
+    with expectation:
+        res = Pipe.run_dag(stages, 3, executor=executor)
+        assert res["_after_fail"] is None
+
+
+def test_pipe_run_dag_rejects_cycles():
+    @Pipe.stage()
+    def first(data):
+        return data
+
+    @Pipe.stage(depends_on=[first])
+    def second(data):
+        return data
+
+    first.depends_on = (second,)
+    with pytest.raises(ValueError):
+        Pipe.run_dag((first, second), 1)
+
+
+@pytest.mark.parametrize(
+    "executor, chunksize, ordered",
+    (
+        pytest.param("thread", 1, True, id="Ensure runs items on threads"),
+        pytest.param("thread", 3, False, id="Ensure runs unordered chunks"),
+        pytest.param("process", 2, True, id="Ensure runs items on processes"),
+    ),
+)
+def test_pipe_run_many(executor, chunksize, ordered):
+    Pipe.runs.clear()
+    res = Pipe.run_many(
+        (_check_positive, _square),
+        range(10),
+        executor=executor,
+        max_workers=2,
+        chunksize=chunksize,
+        ordered=ordered,
+    )
+    assert (res if ordered else sorted(res)) == [n * n for n in range(10)]
+
+    assert len(Pipe.runs) == 10
+    assert all(len(run.log) == 2 for run in Pipe.runs)
+    entries = [entry for run in Pipe.runs for entry in run.log.values()]
+    squares = [
+        entry[PipeKey.RETURN.value]
+        for entry in entries
+        if entry[PipeKey.FUNC.value] == "_square"
+    ]
+    assert sorted(squares) == [n * n for n in range(10)]
+
+
+@pytest.mark.parametrize("executor", ("thread", "process"))
+def test_pipe_run_many_raises_on_break(executor):
+    with pytest.raises(ValueError):
+        Pipe.run_many((_check_positive, _square), [1, -1], executor=executor)
+
+
+def test_pipe_run_many_cancels_pending_on_break():
+    calls = []
+
+    @Pipe.stage()
+    def slow_check(n):
+        calls.append(n)
+        time.sleep(0.01)
+        if n < 0:
+            raise ValueError(n)
+        return n
+
+    with pytest.raises(ValueError):
+        Pipe.run_many((slow_check,), [-1] + [1] * 50, max_workers=1)
+    assert len(calls) < 50
+
+
+@pytest.mark.parametrize("prefetch", (0, 2))
+def test_pipe_stream(prefetch):
+    @Pipe.stage()
+    def parse(lines):
+        for line in lines:
+            yield int(line)
+
+    @Pipe.stage()
+    def double(n):
+        return n * 2
+
+    @Pipe.stage()
+    def evens_only(numbers):
+        for n in numbers:
+            if n % 4 == 0:
+                yield n
+
+    stream = Pipe.stream((parse, double, evens_only), map(str, range(10)), prefetch)
+    assert list(stream) == [0, 4, 8, 12, 16]
+
+    entries = list(Pipe.last_run().log.values())
+    assert len(entries) == 12
+    items = {
+        entry[PipeKey.FUNC.value]: entry.get(PipeKey.ITEMS.value) for entry in entries
+    }
+    assert items["parse"] == 10
+    assert items["evens_only"] == 5
+    assert all(PipeKey.END_NS.value in entry for entry in entries)
+
+
+def test_pipe_stream_bounds_its_log():
+    @Pipe.stage()
+    def double(n):
+        return n * 2
+
+    assert sum(Pipe.stream((double,), range(5000), max_log_entries=100)) == 24995000
+    log = Pipe.last_run().log
+    assert len(log) == 100
+    assert all(entry[PipeKey.RETURN.value] == {"type": "int"} for entry in log.values())
+
+    list(Pipe.stream((double,), range(10), max_log_entries=None, metadata_only=False))
+    returns = [entry[PipeKey.RETURN.value] for entry in Pipe.last_run().log.values()]
+    assert returns == [n * 2 for n in range(10)]
+
+
+def test_pipe_stream_rejects_invalid_max_log_entries():
+    with pytest.raises(ValueError):
+        Pipe.stream((), [], max_log_entries=0)
+
+
+def test_pipe_stream_is_lazy():
+    pulled = []
+
+    def source():
+        for n in range(1_000_000):
+            pulled.append(n)
+            yield n
+
+    @Pipe.stage()
+    def passthrough(numbers):
+        yield from numbers
+
+    stream = Pipe.stream((passthrough,), source())
+    assert next(stream) == 0
+    assert len(pulled) == 1
+    stream.close()
+
+
+@pytest.mark.parametrize("prefetch", (0, 2))
+def test_pipe_stream_raises_on_break(prefetch):
+    @Pipe.stage()
+    def parse(lines):
+        for line in lines:
+            yield int(line)
+
+    with pytest.raises(ValueError):
+        list(Pipe.stream((parse,), ["1", "x", "3"], prefetch))
+
+
+@pytest.fixture
+def reset_log_config():
+    yield
+    Pipe.configure_log()
+
+
+def test_pipe_log_ring_buffer(reset_log_config):
+    Pipe.configure_log(max_entries=3)
+
+    @Pipe.stage()
+    def inc(n):
+        return n + 1
+
+    Pipe.run([inc] * 10, 0)
+    assert sorted(Pipe.last_run().log) == [7, 8, 9]
+
+    for n in range(10):
+        inc(n)
+    assert len(Pipe.log) == 3
+    assert sorted(Pipe.log) == list(range(Pipe.stage_count - 3, Pipe.stage_count))
+
+
+def test_pipe_max_runs(reset_log_config):
+    Pipe.configure_log(max_runs=2)
+
+    @Pipe.stage()
+    def inc(n):
+        return n + 1
+
+    for n in range(5):
+        Pipe.run([inc], n)
+    assert len(Pipe.runs) == 2
+    assert Pipe.runs[-1] is Pipe.last_run()
+
+
+def test_pipe_runs_bounded_by_default(reset_log_config):
+    assert Pipe.runs.maxlen == 1000
+    Pipe.configure_log(max_runs=None)
+    assert Pipe.runs.maxlen is None
+
+
+def test_pipe_log_sampling(reset_log_config):
+    Pipe.configure_log(sample_rate=0.0)
+
+    @Pipe.stage()
+    def inc(n):
+        return n + 1
+
+    assert Pipe.run([inc] * 5, 0) == 5
+    assert not Pipe.last_run().log
+    assert next(Pipe.last_run().stage_ids) == 5
+
+
+def test_pipe_log_metadata_only(reset_log_config):
+    Pipe.configure_log(metadata_only=True)
+
+    @Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value)
+    def first(numbers, scale=1):
+        return [n * scale for n in numbers]
+
+    @Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value)
+    def fails(numbers):
+        raise KeyError("missing")
+
+    Pipe.run((first, fails), [1, 2, 3])
+    first_entry = Pipe.last_run().log[0]
+    assert first_entry[PipeKey.ARGS.value] == {
+        "type": "tuple",
+        "items": [{"type": "list", "len": 3}],
+    }
+    assert first_entry[PipeKey.RETURN.value] == {"type": "list", "len": 3}
+    assert Pipe.last_run().log[1][PipeKey.EXCEPTIONS.value] == [KeyError]
+
+
+def test_pipe_log_metadata_only_unsized_array(reset_log_config):
+    np = pytest.importorskip("numpy")
+    Pipe.configure_log(metadata_only=True)
+
+    @Pipe.stage()
+    def total(values):
+        return np.array(np.sum(values))
+
+    Pipe.run((total, total), [1, 2])
+    log = Pipe.last_run().log
+    assert log[0][PipeKey.RETURN.value] == {"type": "ndarray"}
+    assert log[1][PipeKey.ARGS.value] == {
+        "type": "tuple",
+        "items": [{"type": "ndarray"}],
+    }
+    assert log[1][PipeKey.EXCEPTIONS.value] == []
+
+
+def test_pipe_configure_log_rejects_invalid():
+    with pytest.raises(ValueError):
+        Pipe.configure_log(max_entries=0)
+    with pytest.raises(ValueError):
+        Pipe.configure_log(sample_rate=2)
+    with pytest.raises(ValueError):
+        Pipe.configure_log(max_runs=0)
+
+
+def test_pipe_timings():
+    @Pipe.stage(track_memory=True)
+    def allocate(n):
+        return [0] * n
+
+    @Pipe.stage()
+    def wait(data):
+        time.sleep(0.01)
+        return len(data)
+
+    before_ns = time.time_ns()
+    assert Pipe.run((allocate, wait), 100_000) == 100_000
+    allocate_timing, wait_timing = Pipe.timings()
+
+    assert allocate_timing.func == "allocate"
+    assert allocate_timing.memory_peak >= 100_000 * 8
+    assert wait_timing.memory_peak is None
+    assert wait_timing.duration_ns >= 10_000_000
+    assert wait_timing.cpu_ns < wait_timing.duration_ns
+    assert wait_timing.end_ns - wait_timing.start_ns == wait_timing.duration_ns
+
+    wall_timing = Pipe.timings(wall_clock=True)[-1]
+    assert Pipe.timings(run=Pipe.last_run())[0] == allocate_timing
+    assert before_ns <= wall_timing.start_ns <= time.time_ns()
+
+
+def test_pipe_concurrent_runs_keep_separate_logs():
+    @Pipe.stage()
+    def inc(n):
+        time.sleep(0)
+        return n + 1
+
+    runs = {}
+
+    def worker(start):
+        assert Pipe.run([inc] * 50, start) == start + 50
+        runs[start] = Pipe.last_run()
+
+    threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for start, run in runs.items():
+        assert sorted(run.log) == list(range(50))
+        returns = [run.log[stage][PipeKey.RETURN.value] for stage in range(50)]
+        assert returns == list(range(start + 1, start + 51))
+    assert len({run.run_id for run in runs.values()}) == 8
+
+    view = Pipe.global_log()
+    assert all((run.run_id, 49) in view for run in runs.values())
+
+
+def test_pipe_concurrent_async_runs_keep_separate_logs():
+    @Pipe.stage()
+    async def inc(n):
+        await asyncio.sleep(0)
+        return n + 1
+
+    async def one_run(start):
+        res = await Pipe.arun([inc] * 5, start)
+        return res, Pipe.last_run()
+
+    async def main():
+        return await asyncio.gather(*(one_run(n * 10) for n in range(4)))
+
+    for n, (res, run) in enumerate(asyncio.run(main())):
+        assert res == n * 10 + 5
+        assert [entry[PipeKey.RETURN.value] for entry in run.log.values()] == list(
+            range(n * 10 + 1, n * 10 + 6)
+        )
+
+
+def test_pipe_nested_run_shares_context():
+    @Pipe.stage()
+    def inc(n):
+        return n + 1
+
+    with Pipe.run_context() as run:
+        assert Pipe.current_run() is run
+        Pipe.run([inc], 0)
+        Pipe.run([inc, inc], 0)
+    assert Pipe.current_run() is None
+    assert sorted(run.log) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("backend", ("memory", "disk"))
+def test_pipe_stage_cache(backend, tmp_path):
+    cache = MemoryCache() if backend == "memory" else DiskCache(tmp_path)
+    calls = []
+
+    @Pipe.stage(cache=cache)
+    def slow_square(n):
+        calls.append(n)
+        return n * n
+
+    assert Pipe.run([slow_square], 3) == 9
+    assert Pipe.run([slow_square], 3) == 9
+    assert Pipe.run([slow_square], 4) == 16
+    assert calls == [3, 4]
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert Pipe.last_run().log[0][PipeKey.CACHE.value] == CacheStatus.MISS.value
+
+
+def test_pipe_stage_cache_keys_factory_stages_apart():
+    cache = MemoryCache()
+
+    def make(factor):
+        @Pipe.stage(cache=cache)
+        def scale(n):
+            return n * factor
+
+        return scale
+
+    assert Pipe.run([make(2)], 3) == 6
+    assert Pipe.run([make(10)], 3) == 30
+    assert Pipe.run([make(2)], 3) == 6
+    assert cache.hits == 1
+
+
+def test_pipe_stage_cache_async():
+    cache = MemoryCache()
+
+    @Pipe.stage(cache=cache)
+    async def double(n):
+        await asyncio.sleep(0)
+        return n * 2
+
+    assert asyncio.run(Pipe.arun([double, double], 1)) == 4
+    with Pipe.run_context() as run:
+        assert asyncio.run(Pipe.arun([double], 1)) == 2
+    assert run.log[0][PipeKey.CACHE.value] == CacheStatus.HIT.value
+
+
+def test_pipe_stage_cache_skips_failures_and_unhashable():
+    cache = MemoryCache()
+
+    @Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value, cache=cache)
+    def first(data):
+        if data is None:
+            raise ValueError("no data")
+        return data
+
+    first(None)
+    first(None)
+    assert cache.hits == 0
+    first(threading.Lock())
+    assert Pipe.log[Pipe.stage_count - 1][PipeKey.CACHE.value] == (
+        CacheStatus.UNHASHABLE.value
+    )
+
+
+def test_pipe_stage_cache_rejects_generators():
+    with pytest.raises(TypeError):
+
+        @Pipe.stage(cache=MemoryCache())
+        def items(data):
+            yield from data
+
+
+def test_pipe_run_resumes_from_checkpoint(tmp_path):
+    calls = []
+    should_fail = [True]
+
+    @Pipe.stage()
+    def load(n):
+        calls.append("load")
+        return list(range(n))
+
+    @Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value)
+    def optional(numbers):
+        calls.append("optional")
+        raise KeyError("not needed")
+
+    @Pipe.stage()
+    def flaky(_):
+        calls.append("flaky")
+        if should_fail[0]:
+            raise ValueError("flaky")
+        return "done"
+
+    stages = (load, optional, flaky)
+    with pytest.raises(ValueError):
+        Pipe.run(stages, 3, checkpoint_dir=tmp_path)
+    assert calls == ["load", "optional", "flaky"]
+
+    should_fail[0] = False
+    assert Pipe.run(stages, 3, checkpoint_dir=tmp_path, resume=True) == "done"
+    assert calls == ["load", "optional", "flaky", "flaky"]
+
+    assert Pipe.run(stages, 3, checkpoint_dir=tmp_path, resume=True) == "done"
+    assert calls.count("flaky") == 2
+
+    assert Pipe.run(stages, 3, checkpoint_dir=tmp_path) == "done"
+    assert calls.count("load") == 2
+
+
+@pytest.mark.parametrize(
+    "failures, expected_context",
+    (
+        pytest.param(2, does_not_raise(), id="Ensure retries a flaky stage"),
+        pytest.param(3, pytest.raises(OSError), id="Ensure breaks after giving up"),
+    ),
+)
+def test_pipe_stage_retry(failures, expected_context):
+    calls = []
+
+    @Pipe.stage(
+        action_on_fail=ActionOnFail.RETRY.value,
+        retry_policy=RetryPolicy(attempts=3, base_delay=0.001, jitter=0.0),
+    )
+    def read(n):
+        calls.append(n)
+        if len(calls) <= failures:
+            raise OSError("busy")
+        return n
+
+    with expected_context:
+        assert Pipe.run([read], 1) == 1
+    entry = Pipe.last_run().log[0]
+    assert entry[PipeKey.ATTEMPTS.value] == 3
+    assert entry[PipeKey.RETRY_WAIT_NS.value] == 3_000_000
+    assert len(entry[PipeKey.EXCEPTIONS.value]) == failures
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        pytest.param({"timeout": 0}, id="Ensure timeout must be positive"),
+        pytest.param(
+            {"retry_policy": RetryPolicy()},
+            id="Ensure retry_policy needs ActionOnFail.RETRY",
+        ),
+        pytest.param(
+            {
+                "action_on_fail": ActionOnFail.CONTINUE.value,
+                "retry_policy": RetryPolicy(),
+            },
+            id="Ensure retry_policy isn't ignored when continuing",
+        ),
+    ),
+)
+def test_pipe_stage_rejects_invalid(kwargs):
+    with pytest.raises(ValueError):
+        Pipe.stage(**kwargs)
+
+
+def test_pipe_stage_retry_async():
+    calls = []
+
+    @Pipe.stage(
+        action_on_fail=ActionOnFail.RETRY.value,
+        retry_policy=RetryPolicy(base_delay=0.001),
+    )
+    async def fetch(n):
+        calls.append(n)
+        if len(calls) < 2:
+            raise ConnectionError("flaky")
+        return n + 1
+
+    with Pipe.run_context() as run:
+        assert asyncio.run(Pipe.arun([fetch], 1)) == 2
+    assert run.log[0][PipeKey.ATTEMPTS.value] == 2
+
+
+@pytest.mark.parametrize(
+    "action_on_fail, expected_context",
+    (
+        pytest.param(
+            ActionOnFail.BREAK.value,
+            pytest.raises(TimeoutError),
+            id="Ensure breaks on timeout",
+        ),
+        pytest.param(
+            ActionOnFail.CONTINUE.value,
+            does_not_raise(),
+            id="Ensure continues on timeout",
+        ),
+    ),
+)
+@pytest.mark.parametrize("backend", ("thread", "process"))
+def test_pipe_stage_timeout(action_on_fail, expected_context, backend):
+    stuck = Pipe.stage(
+        action_on_fail=action_on_fail, timeout=0.05, timeout_backend=backend
+    )(_sleep)
+
+    assert stuck(0) == 0
+    start = time.perf_counter()
+    with expected_context:
+        assert stuck(5) is None
+    assert time.perf_counter() - start < 1
+    exceptions = Pipe.log[Pipe.stage_count - 1][PipeKey.EXCEPTIONS.value]
+    assert isinstance(exceptions[0], TimeoutError)
+
+
+def test_pipe_stage_timeout_process_limits_start(monkeypatch):
+    monkeypatch.setattr("src.useful_decorators.pipeline.pipe._START_TIMEOUT", 0)
+    stage = Pipe.stage(timeout=1e-6, timeout_backend="process")(_sleep)
+    with pytest.raises(TimeoutError, match="didn't start"):
+        stage(0)
+
+
+def test_pipe_stage_timeout_process_raises_stage_error():
+    fails = Pipe.stage(timeout=5, timeout_backend="process")(_raise_key_error)
+    with pytest.raises(KeyError):
+        fails(1)
+
+
+def test_pipe_stage_timeout_process_loses_side_effects():
+    append = Pipe.stage(timeout=5, timeout_backend="process")(_append)
+    items = []
+    assert append(items) == 1
+    assert items == []
+
+
+@pytest.mark.parametrize(
+    "make_stage, arg",
+    (
+        pytest.param(
+            lambda: lambda n: n, 1, id="Ensure rejects functions that aren't importable"
+        ),
+        pytest.param(
+            lambda: _sleep, threading.Lock(), id="Ensure rejects unpicklable arguments"
+        ),
+    ),
+)
+def test_pipe_stage_timeout_process_rejects_unpicklable(make_stage, arg):
+    stage = Pipe.stage(timeout=5, timeout_backend="process")(make_stage())
+    with pytest.raises(TypeError, match="timeout_backend='process'"):
+        stage(arg)
+
+
+def test_pipe_stage_timeout_async():
+    @Pipe.stage(action_on_fail=ActionOnFail.CONTINUE.value, timeout=0.05)
+    async def stuck(n):
+        await asyncio.sleep(n)
+        return n
+
+    with Pipe.run_context() as run:
+        assert asyncio.run(Pipe.arun([stuck], 5)) is None
+    assert isinstance(run.log[0][PipeKey.EXCEPTIONS.value][0], TimeoutError)
+
+
+def test_pipe_stage_timeout_per_retry_attempt():
+    calls = []
+
+    @Pipe.stage(
+        action_on_fail=ActionOnFail.RETRY.value,
+        retry_policy=RetryPolicy(base_delay=0.001),
+        timeout=0.05,
+    )
+    def slow_then_fast(n):
+        calls.append(n)
+        if len(calls) == 1:
+            time.sleep(0.2)
+        return n
+
+    assert Pipe.run([slow_then_fast], 3) == 3
+    assert Pipe.last_run().log[0][PipeKey.ATTEMPTS.value] == 2
+
+
+def test_pipe_stage_memory_concurrent_stages():
+    # both stages hold their allocation until the other has made its own, so
+    # their traces overlap whichever finishes first
+    barrier = threading.Barrier(2, timeout=5)
+
+    @Pipe.stage(track_memory=True, depends_on=[_load])
+    def small(numbers):
+        held = [bytearray(1_000) for _ in range(100)]
+        barrier.wait()
+        return len(held)
+
+    @Pipe.stage(track_memory=True, depends_on=[_load])
+    def large(numbers):
+        held = [bytearray(1_000) for _ in range(300)]
+        barrier.wait()
+        time.sleep(0.01)
+        return len(held)
+
+    with Pipe.run_context() as run:
+        res = Pipe.run_dag((_load, small, large), 1, max_workers=2)
+    assert (res["small"], res["large"]) == (100, 300)
+    entries = {entry[PipeKey.FUNC.value]: entry for entry in run.log.values()}
+    assert entries["small"][PipeKey.MEMORY_PEAK.value] >= 100_000
+    assert entries["large"][PipeKey.MEMORY_PEAK.value] >= 300_000
+
+
+def test_pipe_stage_memory_sites():
+    @Pipe.stage(track_memory=3)
+    def allocate(n):
+        return [bytearray(1_000) for _ in range(n)]
+
+    assert len(Pipe.run([allocate], 100)) == 100
+    entry = Pipe.last_run().log[0]
+    assert entry[PipeKey.MEMORY_PEAK.value] >= 100_000
+    assert entry[PipeKey.MEMORY_NET.value] >= 100_000
+    site, size, _ = entry[PipeKey.MEMORY_TOP.value][0]
+    assert "test_pipe.py" in site
+    assert size >= 100_000
@@ -1,3 +1,4 @@
+import asyncio
 import inspect
 from contextlib import nullcontext as does_not_raise
 
@@ -103,3 +104,182 @@ def test_create_arg_dict(
     with expected_context:
         argspec = request.getfixturevalue(argspec_fixt_name)
         assert _create_arg_dict(argspec, args, kwargs) == expected_result
+
+
+@pytest.mark.parametrize(
+    "args, kwargs, expected_result, expected_context",
+    (
+        pytest.param(
+            (0, 0),
+            {},
+            (0, 0, 5),
+            does_not_raise(),
+            id="Ensure falsy positional args are not replaced by defaults",
+        ),
+        pytest.param(
+            (1, 2),
+            {"c": 3},
+            (1, 2, 3),
+            does_not_raise(),
+            id="Ensure kwargs override defaults",
+        ),
+        pytest.param(
+            (1, "2"),
+            {},
+            None,
+            pytest.raises(val.InvalidArgs),
+            id="Ensure only the ruled arg is validated",
+        ),
+        pytest.param(
+            (1, 2),
+            {"c": -1},
+            None,
+            pytest.raises(val.InvalidArgs),
+            id="Ensure keyword only args are validated",
+        ),
+    ),
+)
+def test_validate_args_binding(args, kwargs, expected_result, expected_context):
+    with expected_context:
+
+        @validate_args(validations={"b": [val.is_type(int)], "c": [val.ge(0)]})
+        def some_func(a, b=1, *, c=5):
+            return a, b, c
+
+        assert some_func(*args, **kwargs) == expected_result
+
+
+def test_validate_args_without_rules_returns_func():
+    def some_func(a):
+        return a
+
+    assert validate_args()(some_func) is some_func
+
+
+@pytest.mark.parametrize(
+    "max_failures, args, expected_fails, expected_context",
+    (
+        pytest.param(
+            None,
+            (-1, 5),
+            {"a": 2, "b": 1},
+            pytest.raises(val.InvalidArgs),
+            id="Ensure collects every failure by default",
+        ),
+        pytest.param(
+            1,
+            (-1, 5),
+            {"a": 1},
+            pytest.raises(val.InvalidArgs),
+            id="Ensure stops at the first failure",
+        ),
+        pytest.param(
+            2,
+            (-1, 5),
+            {"a": 2},
+            pytest.raises(val.InvalidArgs),
+            id="Ensure stops after `max_failures` failures",
+        ),
+        pytest.param(
+            3,
+            (-1, 5),
+            {"a": 2, "b": 1},
+            pytest.raises(val.InvalidArgs),
+            id="Ensure carries the remaining budget across args",
+        ),
+    ),
+)
+def test_validate_args_max_failures(
+    max_failures, args, expected_fails, expected_context
+):
+    @validate_args(
+        validations={"a": [val.gt(0), val.eq(1)], "b": [val.lt(5)]},
+        max_failures=max_failures,
+    )
+    def some_func(a, b):
+        return a + b
+
+    with expected_context as exc_info:
+        some_func(*args)
+
+    fails = exc_info.value.fails
+    assert {arg_name: len(fails[arg_name]) for arg_name in fails} == expected_fails
+
+
+def test_validate_args_fail_fast_runs_cheapest_first():
+    @validate_args(
+        validations={"a": [val.re_match("[a-z]+"), val.is_type(str)]},
+        max_failures=1,
+    )
+    def some_func(a):
+        return a
+
+    with pytest.raises(val.InvalidArgs) as exc_info:
+        some_func(1)
+
+    assert isinstance(exc_info.value.failures["a"][0], val.TypeFailure)
+    assert exc_info.value.fails["a"][0].startswith("TypeError(")
+
+
+def test_validate_args_rejects_invalid_max_failures():
+    with pytest.raises(ValueError):
+        validate_args(max_failures=0)
+
+
+async def _is_positive(arg_name, arg_value):
+    await asyncio.sleep(0)
+    if arg_value <= 0:
+        return ValueError(f"`{arg_name}` must be positive. Got: {arg_value}.")
+
+
+async def _double(arg_name, arg_value):
+    await asyncio.sleep(0)
+    return arg_value * 2
+
+
+@pytest.mark.parametrize(
+    "args, expected_result, expected_context",
+    (
+        pytest.param(
+            (1, 2),
+            5,
+            does_not_raise(),
+            id="Ensure awaits async converters and validators",
+        ),
+        pytest.param(
+            (1, -2),
+            None,
+            pytest.raises(val.InvalidArgs),
+            id="Ensure raises for async validator failures",
+        ),
+        pytest.param(
+            ("1", 2),
+            None,
+            pytest.raises(val.InvalidArgs),
+            id="Ensure runs sync validators alongside async ones",
+        ),
+    ),
+)
+def test_validate_args_async(args, expected_result, expected_context):
+    @validate_args(
+        validations={
+            "a": [val.is_type(int)],
+            "b": [_is_positive],
+            "return": [_is_positive],
+        },
+        conversions={"a": [_double]},
+    )
+    async def some_func(a, b):
+        await asyncio.sleep(0)
+        return a + b + 1
+
+    with expected_context:
+        assert asyncio.run(some_func(*args)) == expected_result
+
+
+def test_validate_args_async_rules_need_async_func():
+    with pytest.raises(TypeError):
+
+        @validate_args(validations={"a": [_is_positive]})
+        def some_func(a):
+            return a
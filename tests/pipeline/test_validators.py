@@ -1,3 +1,6 @@
+import json
+import pickle
+import re
 from contextlib import nullcontext as does_not_raise
 
 import pytest
@@ -435,3 +438,288 @@ def test_contains(
     with expected_context:
         res = validators.contains(required_values)(arg_name, arg_value)
         assert isinstance(res, expected_result)
+
+
+@pytest.mark.parametrize(
+    "pattern, flags, arg_value, expected_result, expected_context",
+    (
+        pytest.param(
+            re.compile("[a-z]+"),
+            0,
+            "abc",
+            NoneType,
+            does_not_raise(),
+            id="Ensure accepts a precompiled pattern",
+        ),
+        pytest.param(
+            "[a-z]+",
+            re.IGNORECASE,
+            "ABC",
+            NoneType,
+            does_not_raise(),
+            id="Ensure applies flags",
+        ),
+        pytest.param(
+            re.compile("[a-z]+"),
+            re.IGNORECASE,
+            "ABC",
+            None,
+            pytest.raises(ValueError),
+            id="Ensure raises when flags are given with a precompiled pattern",
+        ),
+    ),
+)
+def test_re_match_compiled(
+    pattern, flags, arg_value, expected_result, expected_context
+):
+    with expected_context:
+        res = validators.re_match(pattern, flags)("a", arg_value)
+        assert isinstance(res, expected_result)
+
+
+@pytest.mark.parametrize(
+    "patterns, arg_value, expected_result, expected_context",
+    (
+        pytest.param(
+            ["[0-9]+", "[a-z]+"],
+            "abc",
+            NoneType,
+            does_not_raise(),
+            id="Ensure returns None when any pattern matches",
+        ),
+        pytest.param(
+            ["[0-9]+", "[a-z]+"],
+            "abc123",
+            ValueError,
+            does_not_raise(),
+            id="Ensure requires a full match of a single pattern",
+        ),
+        pytest.param(
+            ["[0-9]+", re.compile("[a-z]+", re.IGNORECASE)],
+            "ABC",
+            NoneType,
+            does_not_raise(),
+            id="Ensure keeps flags of precompiled patterns",
+        ),
+        pytest.param(
+            ["[0-9]+", re.compile("[a-z]+", re.IGNORECASE)],
+            1,
+            TypeError,
+            does_not_raise(),
+            id="Ensure returns TypeError when `arg_value` is invalid",
+        ),
+        pytest.param(
+            [re.compile(r"\w+", re.ASCII), "[0-9]+"],
+            "é",
+            ValueError,
+            does_not_raise(),
+            id="Ensure keeps global flags of precompiled patterns",
+        ),
+        pytest.param(
+            ["(?P<x>a)", "(?P<x>b)"],
+            "b",
+            NoneType,
+            does_not_raise(),
+            id="Ensure patterns may reuse group names",
+        ),
+        pytest.param(
+            [r"(a)\1", r"(b)\1"],
+            "bb",
+            NoneType,
+            does_not_raise(),
+            id="Ensure backreferences keep their meaning",
+        ),
+    ),
+)
+def test_re_match_any(patterns, arg_value, expected_result, expected_context):
+    with expected_context:
+        res = validators.re_match_any(patterns)("a", arg_value)
+        assert isinstance(res, expected_result)
+
+
+@pytest.mark.parametrize(
+    "patterns, arg_value, expected_result, expected_context",
+    (
+        pytest.param(
+            ["[0-9]+", "x"],
+            "ab1",
+            NoneType,
+            does_not_raise(),
+            id="Ensure returns None when any pattern is found",
+        ),
+        pytest.param(
+            ["[0-9]+", "x"],
+            "abc",
+            ValueError,
+            does_not_raise(),
+            id="Ensure returns ValueError when no pattern is found",
+        ),
+    ),
+)
+def test_re_search_any(patterns, arg_value, expected_result, expected_context):
+    with expected_context:
+        res = validators.re_search_any(patterns)("a", arg_value)
+        assert isinstance(res, expected_result)
+
+
+@pytest.mark.parametrize(
+    "valid_values, arg_value, expected_result, expected_context",
+    (
+        pytest.param(
+            (v for v in (0, 1, 2)),
+            2,
+            NoneType,
+            does_not_raise(),
+            id="Ensure accepts a one shot iterable",
+        ),
+        pytest.param(
+            (0, 1, 2),
+            [1],
+            ValueError,
+            does_not_raise(),
+            id="Ensure returns ValueError when `arg_value` is unhashable",
+        ),
+        pytest.param(
+            ([0], [1]),
+            [1],
+            NoneType,
+            does_not_raise(),
+            id="Ensure falls back to a tuple for unhashable valid values",
+        ),
+        pytest.param(
+            validators.SortedAllowlist(["b", "c", "a"]),
+            "c",
+            NoneType,
+            does_not_raise(),
+            id="Ensure searches a sorted allowlist",
+        ),
+        pytest.param(
+            validators.SortedAllowlist(["a", "b", "c"], presorted=True),
+            "d",
+            ValueError,
+            does_not_raise(),
+            id="Ensure returns ValueError when missing from a sorted allowlist",
+        ),
+        pytest.param(
+            "abc",
+            "ab",
+            NoneType,
+            does_not_raise(),
+            id="Ensure a string allowlist still matches substrings",
+        ),
+        pytest.param(
+            "abc",
+            "ac",
+            ValueError,
+            does_not_raise(),
+            id="Ensure a string allowlist rejects non-substrings",
+        ),
+    ),
+)
+def test_is_in_frozen(valid_values, arg_value, expected_result, expected_context):
+    with expected_context:
+        res = validators.is_in(valid_values)("a", arg_value)
+        assert isinstance(res, expected_result)
+
+
+def test_is_in_message_truncates_large_allowlist():
+    res = validators.is_in(range(10_000))("a", -1)
+    assert "(10000 values)" in str(res)
+    assert "9999" not in str(res)
+
+
+def test_is_in_keeps_range():
+    huge = range(10**12)
+    validator = validators.is_in(huge)
+    assert validator.param is huge
+    assert validator("a", 10**11) is None
+    assert validator("a", -1) is not None
+
+
+def test_sorted_allowlist_from_file(tmp_path):
+    path = tmp_path / "codes.txt"
+    path.write_text("GBP\nUSD\n\nEUR\n")
+    allowlist = validators.SortedAllowlist.from_file(str(path))
+    assert list(allowlist) == ["EUR", "GBP", "USD"]
+    assert "USD" in allowlist
+    assert "JPY" not in allowlist
+
+
+def test_sorted_allowlist_from_npy(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = tmp_path / "codes.npy"
+    np.save(path, np.array([1, 5, 9]))
+    allowlist = validators.SortedAllowlist.from_npy(str(path))
+    assert 5 in allowlist
+    assert 6 not in allowlist
+    assert 10 not in allowlist
+
+
+@pytest.mark.parametrize(
+    "required_values, arg_value, expected_result, expected_context",
+    (
+        pytest.param(
+            (1, 2),
+            [3, 2, 1],
+            NoneType,
+            does_not_raise(),
+            id="Ensure returns None when all values are present",
+        ),
+        pytest.param(
+            ("ab", "cd"),
+            "xabcdx",
+            NoneType,
+            does_not_raise(),
+            id="Ensure keeps substring semantics for strings",
+        ),
+        pytest.param(
+            (1, 2),
+            [[1], 1],
+            ValueError,
+            does_not_raise(),
+            id="Ensure falls back when `arg_value` has unhashable items",
+        ),
+        pytest.param(
+            (1, 2),
+            {1: "a", 2: "b"},
+            NoneType,
+            does_not_raise(),
+            id="Ensure checks mapping keys",
+        ),
+    ),
+)
+def test_contains_frozen(required_values, arg_value, expected_result, expected_context):
+    with expected_context:
+        res = validators.contains(required_values)("a", arg_value)
+        assert isinstance(res, expected_result)
+
+
+def test_failure_renders_lazily():
+    calls = []
+    validator = validators.gt(1)
+    message = validator.message
+    validator.message = lambda *args: calls.append(args) or message(*args)
+
+    res = validator("a", 0)
+    assert not calls
+    assert repr(res) == "ValueError('`a` must be greater than 1. Got: 0.')"
+    assert calls == [("a", 0)]
+
+
+def test_failure_pickles_as_plain_exception():
+    res = pickle.loads(pickle.dumps(validators.is_type(int)("a", "1")))
+    assert type(res) is TypeError
+    assert str(res) == "`a` must be type <class 'int'>. Got: <class 'str'>"
+
+
+def test_failure_args_hold_the_message():
+    res = validators.lt(1)("a", 2)
+    assert res.args == ("`a` must be less than 1. Got: 2.",)
+
+
+def test_invalid_args_renders_failures():
+    err = validators.InvalidArgs({"a": [validators.lt(1)("a", 2)]})
+    assert json.loads(str(err)) == {
+        "a": ["ValueError('`a` must be less than 1. Got: 2.')"]
+    }
+    assert err.fails == {"a": ["ValueError('`a` must be less than 1. Got: 2.')"]}
@@ -0,0 +1,171 @@
+import os
+import threading
+
+import pytest
+
+from src.useful_decorators.capture import (
+    CaseStore,
+    case_key,
+    load_cases,
+    pytest_params,
+)
+from src.useful_decorators.decorators import QueueSink, print_test_case
+
+
+def _add(a, b=0):
+    return a + b
+
+
+def _union(a, b):
+    return a | b
+
+
+@pytest.mark.parametrize("fmt", ("jsonl", "pickle"))
+def test_case_store_round_trip(fmt, tmp_path):
+    store = CaseStore(tmp_path, fmt=fmt)
+    add = print_test_case(_add, sink=store)
+    for a in (1, 2, 1, 3):
+        add(a, b=1)
+    store.close()
+
+    records = list(load_cases(tmp_path))
+    assert [(r["params"], r["return"]) for r in records] == [
+        ({"a": 1, "b": 1}, 2),
+        ({"a": 2, "b": 1}, 3),
+        ({"a": 3, "b": 1}, 4),
+    ]
+    params = pytest_params(tmp_path, "_add")
+    assert [p.values for p in params] == [
+        ({"a": 1, "b": 1}, 2),
+        ({"a": 2, "b": 1}, 3),
+        ({"a": 3, "b": 1}, 4),
+    ]
+    assert params[0].id.startswith("_add-")
+
+
+def test_case_store_dedups_across_instances(tmp_path):
+    store = CaseStore(tmp_path)
+    print_test_case(_add, sink=store)(1, 2)
+    store.close()
+
+    store = CaseStore(tmp_path)
+    add = print_test_case(_add, sink=store)
+    add(1, 2)
+    add(2, 2)
+    store.close()
+    assert len(store) == 2
+    assert len(list(load_cases(tmp_path))) == 2
+
+
+def test_case_store_max_records(tmp_path):
+    store = CaseStore(tmp_path, max_records=3)
+    add = print_test_case(_add, sink=store)
+    for a in range(10):
+        add(a)
+    store.close()
+    assert len(list(load_cases(tmp_path))) == 3
+
+
+def test_case_store_rotates_shards(tmp_path):
+    store = CaseStore(tmp_path, max_shard_bytes=100)
+    add = print_test_case(_add, sink=store)
+    for a in range(10):
+        add(a)
+    store.close()
+    assert len(os.listdir(tmp_path)) > 1
+    assert [r["params"]["a"] for r in load_cases(tmp_path)] == list(range(10))
+
+
+def test_case_store_skips_unserialisable(tmp_path):
+    store = CaseStore(tmp_path)
+    print_test_case(_union, sink=store)({1}, {2})
+    store.close()
+    assert store.skipped == 1
+    assert list(load_cases(tmp_path)) == []
+
+
+def _nest(a, b):
+    return (a, b), {a: "x"}
+
+
+@pytest.mark.parametrize(
+    "fmt, skipped, expected",
+    (
+        pytest.param(
+            "jsonl", 1, [], id="Ensure jsonl skips cases that don't round-trip"
+        ),
+        pytest.param(
+            "pickle",
+            0,
+            [({"a": 1, "b": (2, 3)}, ((1, (2, 3)), {1: "x"}))],
+            id="Ensure pickle keeps tuples and int keys",
+        ),
+    ),
+)
+def test_case_store_replays_as_captured(fmt, skipped, expected, tmp_path):
+    store = CaseStore(tmp_path, fmt=fmt)
+    print_test_case(_nest, sink=store)(1, (2, 3))
+    store.close()
+    assert store.skipped == skipped
+    assert [(r["params"], r["return"]) for r in load_cases(tmp_path)] == expected
+
+
+def test_case_store_ignores_truncated_line(tmp_path):
+    store = CaseStore(tmp_path)
+    print_test_case(_add, sink=store)(1, 2)
+    store.close()
+    (path,) = tmp_path.glob("shard-*.jsonl")
+    with open(path, "a") as f:
+        f.write('{"hash": "ab')
+    assert len(list(load_cases(tmp_path))) == 1
+
+
+def test_case_store_behind_queue_sink_with_sampling(tmp_path):
+    store = CaseStore(tmp_path)
+    sink = QueueSink(store)
+    add = print_test_case(_add, sink=sink, every_n=2)
+    for a in range(10):
+        add(a)
+    sink.close()
+    assert len(list(load_cases(tmp_path))) == 5
+
+
+def test_case_store_instances_write_separate_shards(tmp_path):
+    stores = [CaseStore(tmp_path, fmt="pickle") for _ in range(2)]
+    for n, store in enumerate(stores):
+        print_test_case(_add, sink=store)(n)
+        store.close()
+    assert len(os.listdir(tmp_path)) == 2
+    assert sorted(r["params"]["a"] for r in load_cases(tmp_path)) == [0, 1]
+
+
+def test_case_store_max_records_across_threads(tmp_path):
+    store = CaseStore(tmp_path, max_records=5)
+    add = print_test_case(_add, sink=store)
+    threads = [
+        threading.Thread(target=lambda i=i: [add(i * 100 + a) for a in range(100)])
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    assert len(list(load_cases(tmp_path))) == 5
+
+
+def test_case_key_ignores_keyword_order():
+    assert case_key("f", {"a": 1, "b": 2}) == case_key("f", {"b": 2, "a": 1})
+    assert case_key("f", {"a": 1}) != case_key("g", {"a": 1})
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        pytest.param({"fmt": "csv"}, id="Ensure unknown formats are rejected"),
+        pytest.param({"max_records": 0}, id="Ensure max_records >= 1"),
+    ),
+)
+def test_case_store_rejects_invalid(kwargs, tmp_path):
+    with pytest.raises(ValueError):
+        CaseStore(tmp_path, **kwargs)
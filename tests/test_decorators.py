@@ -1,8 +1,32 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
 from contextlib import nullcontext as does_not_raise
 
 import pytest
 
-from src.useful_decorators.decorators import ExceptionLogger, debug, print_test_case
+from src.useful_decorators.decorators import (
+    ExceptionLogger,
+    JsonlSink,
+    LatencyHistogram,
+    LatencyRecorder,
+    LoggingSink,
+    QueueSink,
+    RetryLogger,
+    RetryPolicy,
+    _bucket,
+    _bucket_upper,
+    debug,
+    print_test_case,
+    profile_func,
+    profile_memory,
+)
 
 
 @pytest.mark.parametrize(
@@ -108,3 +132,581 @@ def test_print_test_case(capsys, kwargs, expected_result):
     some_func(**kwargs)
     captured = capsys.readouterr()
     assert captured.out == expected_result
+
+
+def test_catch_raise_async():
+    @ExceptionLogger.catch_raise(ValueError, ZeroDivisionError, "no zeros")
+    async def div(a, b):
+        await asyncio.sleep(0)
+        return a / b
+
+    assert asyncio.run(div(4, 2)) == (2, None)
+
+    res, err = asyncio.run(div(1, 0))
+    assert res is None
+    assert isinstance(err, ValueError)
+    assert err.args[0]["msg"] == "no zeros"
+
+
+def test_debug_async(capsys):
+    @debug
+    async def some_func(a, b):
+        return a + b
+
+    assert asyncio.run(some_func(2, b=3)) == 5
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "{'func': 'some_func', 'args': (2,), 'kwargs': {'b': 3}, 'return': 5}\n"
+    )
+
+
+def _flaky(failures, error=ConnectionError):
+    calls = []
+
+    def func(n):
+        calls.append(n)
+        if len(calls) <= failures:
+            raise error("flaky")
+        return n * 2
+
+    return func, calls
+
+
+@pytest.mark.parametrize(
+    "failures, error, policy, expected_calls, expected_context",
+    (
+        pytest.param(
+            2, ConnectionError, {}, 3, does_not_raise(), id="Ensure retries until ok"
+        ),
+        pytest.param(
+            3,
+            ConnectionError,
+            {},
+            3,
+            pytest.raises(ConnectionError),
+            id="Ensure gives up after attempts",
+        ),
+        pytest.param(
+            1,
+            KeyError,
+            {"retry_on": ConnectionError},
+            1,
+            pytest.raises(KeyError),
+            id="Ensure only retries matching exceptions",
+        ),
+        pytest.param(
+            1,
+            TimeoutError,
+            {"retry_on": OSError, "give_up_on": TimeoutError},
+            1,
+            pytest.raises(TimeoutError),
+            id="Ensure gives up on excluded exceptions",
+        ),
+        pytest.param(
+            2,
+            ConnectionError,
+            {"base_delay": 0.05, "jitter": 0.0, "deadline": 0.08},
+            2,
+            pytest.raises(ConnectionError),
+            id="Ensure respects the deadline",
+        ),
+    ),
+)
+def test_retry(failures, error, policy, expected_calls, expected_context):
+    func, calls = _flaky(failures, error)
+    retried = RetryLogger.retry(**{"base_delay": 0.001, **policy})(func)
+    with expected_context:
+        assert retried(2) == 4
+    assert len(calls) == expected_calls
+
+
+def test_retry_logs_attempts():
+    func, _ = _flaky(2)
+    retried = RetryLogger.retry(base_delay=0.001, jitter=0.0)(func)
+    assert retried(1) == 2
+    record = RetryLogger.log[-1]
+    assert record["func"] == "func"
+    assert record["attempts"] == 3
+    assert record["wait_s"] == pytest.approx(0.003)
+    assert all(isinstance(e, ConnectionError) for e in record["errors"])
+
+
+def test_retry_async():
+    calls = []
+
+    @RetryLogger.retry(base_delay=0.001)
+    async def fetch(n):
+        calls.append(n)
+        await asyncio.sleep(0)
+        if len(calls) < 3:
+            raise ConnectionError("flaky")
+        return n
+
+    assert asyncio.run(fetch(5)) == 5
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize(
+    "attempt, elapsed, expected",
+    (
+        pytest.param(1, 0.0, 0.1, id="Ensure first wait is the base delay"),
+        pytest.param(3, 0.0, 0.4, id="Ensure waits grow exponentially"),
+        pytest.param(10, 0.0, 1.0, id="Ensure waits are capped"),
+        pytest.param(11, 0.0, None, id="Ensure gives up after attempts"),
+        pytest.param(1, 4.95, None, id="Ensure gives up before the deadline"),
+    ),
+)
+def test_retry_policy_next_delay(attempt, elapsed, expected):
+    policy = RetryPolicy(attempts=11, max_delay=1.0, jitter=0.0, deadline=5.0)
+    delay = policy.next_delay(ValueError(), attempt, elapsed)
+    assert delay == (expected if expected is None else pytest.approx(expected))
+
+
+def test_retry_policy_jitter_bounds():
+    policy = RetryPolicy(base_delay=1.0, jitter=0.5)
+    delays = [policy.next_delay(ValueError(), 1, 0.0) for _ in range(100)]
+    assert all(0.5 <= delay <= 1.0 for delay in delays)
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+@pytest.mark.parametrize(
+    "kwargs, num_reports",
+    (
+        pytest.param({}, 4, id="Ensure profiles and prints every call"),
+        pytest.param({"every_n": 2}, 2, id="Ensure profiles every nth call"),
+        pytest.param({"sample_rate": 0.0}, 0, id="Ensure samples a fraction"),
+        pytest.param({"aggregate": True}, 0, id="Ensure aggregates without printing"),
+    ),
+)
+def test_profile_func(capsys, kwargs, num_reports):
+    busy = profile_func(**kwargs)(_busy)
+    for _ in range(4):
+        assert busy(100) == _busy(100)
+    assert capsys.readouterr().out.count("function calls") == num_reports
+
+
+def test_profile_func_aggregate_dump(tmp_path):
+    path = str(tmp_path / "busy.prof")
+    busy = profile_func(aggregate=True, dump_path=path)(_busy)
+    for _ in range(3):
+        busy(1000)
+
+    assert "_busy" in busy.profile.report()
+    stats = pstats.Stats(path)
+    calls = [stat[1] for func, stat in stats.stats.items() if func[2] == "_busy"]
+    assert calls == [3]
+
+
+def test_profile_func_sampling_backend(tmp_path):
+    path = str(tmp_path / "busy.folded")
+    busy = profile_func(backend="sampling", interval=0.001)(_busy)
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        busy(10_000)
+    busy.profile.dump(path)
+
+    assert sum(busy.profile.samples.values()) > 0
+    assert "_busy" in busy.profile.report(sort_by="cumulative")
+    with open(path) as f:
+        assert all(line.rsplit(" ", 1)[1].strip().isdigit() for line in f)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        pytest.param({"backend": "perf"}, id="Ensure rejects unknown backends"),
+        pytest.param({"every_n": 0}, id="Ensure every_n >= 1"),
+        pytest.param({"sample_rate": 2}, id="Ensure sample_rate in [0, 1]"),
+        pytest.param({"dump_path": "x.prof"}, id="Ensure dump_path aggregates"),
+    ),
+)
+def test_profile_func_rejects_invalid(kwargs):
+    with pytest.raises(ValueError):
+        profile_func(**kwargs)
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    (
+        pytest.param([], (0, 0, 0, 0, 0), id="Ensure handles no calls"),
+        pytest.param([7], (1, 7, 7, 7, 7), id="Ensure exact below 32ns"),
+        pytest.param(
+            list(range(1, 101)),
+            (100, 51, 95, 99, 100),
+            id="Ensure reports bucket upper bounds",
+        ),
+    ),
+)
+def test_latency_histogram_snapshot(values, expected):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    snap = histogram.snapshot()
+    assert (snap.count, snap.p50_ns, snap.p95_ns, snap.p99_ns, snap.max_ns) == expected
+
+
+def test_latency_histogram_relative_error():
+    histogram = LatencyHistogram()
+    values = [1_000 * 1.1**i for i in range(100)]
+    for value in values:
+        histogram.record(int(value))
+    snap = histogram.snapshot()
+    assert snap.p50_ns == pytest.approx(values[49], rel=1 / 16)
+    assert snap.p99_ns == pytest.approx(values[98], rel=1 / 16)
+    assert snap.max_ns == int(values[-1])
+    assert snap.mean_ns == pytest.approx(sum(map(int, values)) / 100)
+
+
+def test_latency_histogram_record_matches_bucket():
+    # `record` inlines `_bucket`, so the two must agree
+    values = [0, 1, 31, 32, 33, 63, 64, 1_000, 10**9, 2**40 + 12_345]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    counts = histogram.counts()
+    for value in values:
+        index = _bucket(value)
+        assert counts[index] >= 1
+        assert _bucket_upper(index) >= value
+    assert sum(counts) == len(values)
+    assert {i for i, n in enumerate(counts) if n} == set(map(_bucket, values))
+
+
+def test_latency_histogram_thread_shards():
+    histogram = LatencyHistogram()
+
+    def record():
+        for value in range(1_000):
+            histogram.record(value)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert histogram.snapshot().count == 4_000
+    histogram.reset()
+    assert histogram.snapshot().count == 0
+
+
+def test_latency_histogram_retires_exited_threads():
+    histogram = LatencyHistogram()
+
+    for _ in range(20):
+        thread = threading.Thread(target=histogram.record, args=(100,))
+        thread.start()
+        thread.join()
+    histogram.record(200)
+    assert len(histogram._shards) == 1
+    snap = histogram.snapshot()
+    assert (snap.count, snap.max_ns) == (21, 200)
+
+
+def test_latency_recorder_concurrent_exports(tmp_path):
+    LatencyRecorder.histogram("test.exported").record(1_000)
+    path = str(tmp_path / "latency.json")
+    errors = []
+
+    def export():
+        try:
+            for _ in range(20):
+                LatencyRecorder.export(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=export) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(path) as f:
+        assert json.load(f)["test.exported"]["count"] >= 1
+    assert os.listdir(tmp_path) == ["latency.json"]
+
+
+def test_latency_recorder_timed(tmp_path):
+    @LatencyRecorder.timed(name="test.sleepy")
+    def sleepy(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    @LatencyRecorder.timed(name="test.asleepy")
+    async def asleepy(seconds):
+        await asyncio.sleep(seconds)
+
+    sleepy.histogram.reset()
+    for _ in range(3):
+        sleepy(0.002)
+    asyncio.run(asleepy(0.001))
+
+    snap = LatencyRecorder.snapshot()["test.sleepy"]
+    assert snap.count == 3
+    assert snap.p50_ns >= 2_000_000
+    assert LatencyRecorder.snapshot()["test.asleepy"].count >= 1
+
+    json_path = str(tmp_path / "latency.json")
+    LatencyRecorder.export(json_path)
+    with open(json_path) as f:
+        assert json.load(f)["test.sleepy"]["count"] == 3
+
+    prom_path = str(tmp_path / "latency.prom")
+    LatencyRecorder.export(prom_path)
+    with open(prom_path) as f:
+        text = f.read()
+    assert "# TYPE function_latency_seconds summary" in text
+    assert 'function_latency_seconds_count{function="test.sleepy"} 3' in text
+    assert 'function_latency_seconds{function="test.sleepy",quantile="0.99"}' in text
+
+
+_retained = []
+
+
+def _allocate(n, keep=False):
+    data = [bytearray(1_000) for _ in range(n)]
+    if keep:
+        _retained.append(data)
+    return len(data)
+
+
+@pytest.mark.parametrize(
+    "keep, min_net",
+    (
+        pytest.param(False, None, id="Ensure temporary allocations only peak"),
+        pytest.param(True, 100_000, id="Ensure retained allocations are net"),
+    ),
+)
+def test_profile_memory(keep, min_net):
+    allocate = profile_memory(top_n=3)(_allocate)
+    assert allocate(100, keep) == 100
+    usage = allocate.memory.last
+    assert usage.peak >= 100_000
+    if min_net is None:
+        assert usage.net < 10_000
+    else:
+        assert usage.net >= min_net
+        assert "test_decorators.py" in usage.top[0][0]
+        assert usage.top[0][1] >= min_net
+    _retained.clear()
+
+
+def test_profile_memory_aggregates_sampled_calls():
+    allocate = profile_memory(top_n=0, every_n=2)(_allocate)
+    for _ in range(4):
+        allocate(10)
+    assert allocate.memory.calls == 2
+    assert allocate.memory.peak_max >= 10_000
+    assert allocate.memory.last.top == []
+    assert "2 calls" in allocate.memory.report()
+
+
+def test_profile_memory_async():
+    @profile_memory()
+    async def allocate(n):
+        await asyncio.sleep(0)
+        return len([bytearray(1_000) for _ in range(n)])
+
+    assert asyncio.run(allocate(50)) == 50
+    assert allocate.memory.peak_max >= 50_000
+
+
+def test_profile_memory_overlapping_calls():
+    # `outer` starts tracing, `inner` starts while it runs and outlives it
+    inner_started = threading.Event()
+    outer_done = threading.Event()
+
+    @profile_memory(top_n=0)
+    def outer():
+        inner_started.wait(5)
+        return "outer"
+
+    @profile_memory(top_n=0)
+    def inner():
+        # freed before `outer` finishes, the peak must survive it anyway
+        len([bytearray(1_000) for _ in range(200)])
+        inner_started.set()
+        outer_done.wait(5)
+        return "inner"
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(inner()))
+    outer_thread = threading.Thread(target=lambda: results.append(outer()))
+    outer_thread.start()
+    time.sleep(0.01)
+    thread.start()
+    outer_thread.join()
+    outer_done.set()
+    thread.join()
+
+    assert sorted(results) == ["inner", "outer"]
+    assert inner.memory.calls == 1
+    assert inner.memory.peak_max >= 200_000
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_memory_keeps_result_when_tracing_stopped_elsewhere():
+    @profile_memory(top_n=3)
+    def stops_tracing():
+        tracemalloc.stop()
+        return "done"
+
+    assert stops_tracing() == "done"
+
+
+class _ListSink:
+    def __init__(self):
+        self.records = []
+        self.lines = []
+
+    def emit(self, record, render):
+        self.records.append(record)
+        self.lines.append(render(record))
+
+    def close(self):
+        pass
+
+
+def test_debug_sink_options():
+    sink = _ListSink()
+
+    @debug(sink=sink, max_repr=12, every_n=2)
+    def join(items, sep=","):
+        return sep.join(items)
+
+    for _ in range(4):
+        join(["a" * 50, "b"], sep="-")
+
+    assert len(sink.records) == 2
+    record = sink.records[0]
+    assert record["func"] == "join"
+    assert len(record["args"][0]) <= 12
+    assert record["kwargs"] == {"sep": "'-'"}
+    assert len(record["return"]) <= 12
+    assert "..." in record["return"]
+    assert sink.lines[0] == str(record)
+
+
+def test_print_test_case_precomputes_signature(monkeypatch):
+    sink = _ListSink()
+
+    @print_test_case(sink=sink)
+    def add(a, b):
+        return a + b
+
+    def fail(*args, **kwargs):
+        raise AssertionError("signature recomputed")
+
+    monkeypatch.setattr(inspect, "signature", fail)
+    assert add(1, b=2) == 3
+    assert sink.records == [{"func": "add", "params": {"a": 1, "b": 2}, "return": 3}]
+    assert sink.lines == ["pytest.param({'a': 1, 'b': 2}, 3, id=''),"]
+
+
+def test_jsonl_sink(tmp_path):
+    path = str(tmp_path / "calls.jsonl")
+    sink = JsonlSink(path)
+
+    @debug(sink=sink)
+    def pair(a):
+        return {a}
+
+    pair(1)
+    pair(2)
+    sink.close()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record["args"] for record in records] == [[1], [2]]
+    assert records[0]["return"] == "{1}"
+    assert "time" in records[0]
+
+
+def test_logging_sink(caplog):
+    @debug(sink=LoggingSink(level=logging.INFO))
+    def inc(n):
+        return n + 1
+
+    with caplog.at_level(logging.INFO, logger="useful_decorators"):
+        inc(1)
+    assert caplog.records[0].getMessage() == str(
+        {"func": "inc", "args": (1,), "kwargs": {}, "return": 2}
+    )
+    assert caplog.records[0].record["return"] == 2
+
+
+def test_queue_sink():
+    inner = _ListSink()
+    sink = QueueSink(inner, max_queue=1_000)
+
+    @print_test_case(sink=sink)
+    def square(n):
+        return n * n
+
+    for n in range(100):
+        square(n)
+    sink.close()
+    assert len(inner.lines) + sink.dropped == 100
+    assert inner.lines[0] == "pytest.param({'n': 0}, 0, id=''),"
+
+
+def test_queue_sink_snapshots_records():
+    inner = _ListSink()
+    sink = QueueSink(inner)
+
+    @print_test_case(sink=sink)
+    def total(xs, lock=None):
+        return sum(xs)
+
+    xs = [1, 2]
+    lock = threading.Lock()
+    total(xs, lock=lock)
+    xs.append(99)
+    sink.close()
+    assert inner.records[0]["params"]["xs"] == [1, 2]
+    assert inner.records[0]["params"]["lock"] == repr(lock)
+    assert inner.lines[0].startswith("pytest.param({'xs': [1, 2], ")
+
+
+def test_queue_sink_renders_on_writer_thread():
+    inner = _ListSink()
+    sink = QueueSink(inner)
+    threads = []
+
+    def render(record):
+        threads.append(threading.current_thread())
+        return str(record)
+
+    sink.emit({"func": "f"}, render)
+    sink.close()
+    assert inner.lines == [str({"func": "f"})]
+    assert threads == [sink._writer]
+
+
+def test_queue_sink_skips_disabled_sink():
+    logger = logging.getLogger("useful_decorators.disabled")
+    logger.setLevel(logging.WARNING)
+    sink = QueueSink(LoggingSink(logger, level=logging.DEBUG))
+    sink.emit({"func": "f"}, str)
+    assert sink._queue.empty()
+    sink.close()
+    assert sink.dropped == 0
+
+
+def test_queue_sink_drops_after_close():
+    inner = _ListSink()
+    sink = QueueSink(inner)
+    sink.emit({"func": "f"}, str)
+    sink.close()
+    sink.emit({"func": "g"}, str)
+    sink.close()
+    assert inner.lines == [str({"func": "f"})]
+    assert sink.dropped == 1
+
+
+def test_debug_rejects_invalid_options():
+    with pytest.raises(ValueError):
+        debug(max_repr=2)(len)
+    with pytest.raises(ValueError):
+        print_test_case(sample_rate=2)(len)